@@ -0,0 +1,250 @@
+"""
+Score recorded footage offline, no camera or server needed.
+
+    python batch_score.py --pose <pose id> clip.mp4 attempts/ -o results.jsonl
+    python batch_score.py recordings/*.pxkp -o rescored.csv
+
+Takes video files and/or folders of images, runs movenet() + scoring on every
+frame across a process pool and streams one result per frame (in order) to
+JSONL or CSV. Handy for regression-testing scoring changes and for pre-scoring
+user-submitted pose attempts.
+
+Keypoint recordings (.pxkp, from the server's /recording) skip the model
+entirely: the recorded keypoints go straight back through scoring and the
+shrimp check, scored against the pose that was up at the time unless --pose
+is given. recorded_score and recorded_shrimp hold what the live server had
+for comparison.
+
+is_shrimp is the settled flag the live server shows: videos and recordings
+are replayed through a PostureState on their own timeline, in order, so a
+shrimp has to hold for a moment to count. raw_shrimp is detect_shrimp() on
+the frame alone (and all there is for image folders).
+"""
+import argparse
+import contextlib
+import csv
+import json
+import multiprocessing
+import os
+import sys
+
+import cv2
+import numpy as np
+
+# Workers only score, they must never start the server's camera pipeline
+os.environ.pop("POSE_WARM_UP", None)
+# flask_app chats on stdout while it loads the pose database, keep stdout clean for results
+with contextlib.redirect_stdout(sys.stderr):
+    import flask_app
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+RECORDING_EXTENSION = ".pxkp"
+FIELDS = ["source", "frame", "time_ms", "pose_id", "person", "score", "max_possible",
+          "boxes_lit", "total_boxes", "incorrect_boxes", "is_shrimp", "raw_shrimp", "recorded_score",
+          "recorded_shrimp"]
+
+_pose = None
+_model_complexity = None
+_scoring = None
+_pose_id = None
+_target = None
+
+
+def collect_tasks(paths, chunk_size):
+    """Split the inputs into (source, kind, items) chunks a worker can score on its own."""
+    tasks = []
+    for path in paths:
+        if os.path.isdir(path):
+            images = sorted(os.path.join(path, name) for name in os.listdir(path)
+                            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS)
+            for start in range(0, len(images), chunk_size):
+                tasks.append((path, "images", images[start:start + chunk_size]))
+        elif path.lower().endswith(RECORDING_EXTENSION):
+            # No model in the loop, so recordings go in much bigger chunks
+            frame_count = len(flask_app.KeypointRecording(path))
+            for start in range(0, frame_count, chunk_size * 20):
+                tasks.append((path, "keypoints", (start, min(start + chunk_size * 20, frame_count))))
+        else:
+            cap = cv2.VideoCapture(path)
+            if not cap.isOpened():
+                raise RuntimeError(f"Cannot open video {path}")
+            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            cap.release()
+            for start in range(0, frame_count, chunk_size):
+                tasks.append((path, "video", (start, min(start + chunk_size, frame_count))))
+    return tasks
+
+
+def init_worker(db, pose_id, scoring, model_complexity):
+    global _model_complexity, _scoring, _pose_id, _target
+    with contextlib.redirect_stdout(sys.stderr):
+        load_pose_library(db)
+    _model_complexity = model_complexity
+    _scoring = scoring
+    _pose_id = pose_id
+    _target = flask_app.pose_library.get(pose_id) if pose_id else None
+
+
+def get_pose():
+    """The worker's pose model, loaded on the first video/image frame (recordings never need it)."""
+    global _pose
+    if _pose is None:
+        # static_image_mode so every frame is scored on its own and the results don't
+        # depend on how frames got split between workers
+        _pose = flask_app.make_pose(_model_complexity, static_image_mode=True)
+    return _pose
+
+
+def load_pose_library(db):
+    if db != flask_app.pose_library.filename:
+        flask_app.pose_library = flask_app.PoseLibrary(db)
+    # Nothing is loaded on import, and refresh() is a no-op once the file is loaded
+    flask_app.pose_library.refresh()
+    return flask_app.pose_library
+
+
+def read_frames(source, kind, items):
+    """Yield (frame index, time in ms or None, BGR frame) for one chunk."""
+    if kind == "images":
+        for path in items:
+            frame = cv2.imread(path)
+            if frame is None:
+                print(f"Skipping unreadable image {path}", file=sys.stderr)
+                continue
+            yield os.path.basename(path), None, frame
+        return
+
+    start, end = items
+    cap = cv2.VideoCapture(source)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    try:
+        for index in range(start, end):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield index, round(index * 1000.0 / fps, 1), frame
+    finally:
+        cap.release()
+
+
+def read_recording(source, items):
+    """Yield (frame index, time in ms from the start, keypoints, recorded pose id, score, shrimp) for one chunk."""
+    recording = flask_app.KeypointRecording(source)
+    start, end = items
+    t0 = float(recording.records["time"][0])
+    for index in range(start, end):
+        record = recording.records[index]
+        yield (int(record["frame"]), round((float(record["time"]) - t0) * 1000.0, 1), recording.keypoints(index),
+               record["pose_id"].decode(), int(record["score"]), bool(record["shrimp"]))
+
+
+def score_keypoints(keypoints, target):
+    if _scoring == "geometry":
+        return flask_app.score_keypoints(keypoints, target)
+    shapes = flask_app.body_shapes(keypoints)
+    poly_layer = flask_app.poly(np.zeros((flask_app.HEIGHT, flask_app.WIDTH, 3), dtype=np.uint8),
+                                keypoints, shapes=shapes)
+    return flask_app.get_score(poly_layer, target)
+
+
+def score_chunk(task):
+    source, kind, items = task
+    if kind == "keypoints":
+        frames = read_recording(source, items)
+    else:
+        frames = ((index, time_ms, flask_app.movenet(frame, get_pose()), _pose_id, None, None)
+                  for index, time_ms, frame in read_frames(source, kind, items))
+
+    results, keypoints_seen = [], []
+    for index, time_ms, keypoints, recorded_pose, recorded_score, recorded_shrimp in frames:
+        pose_id = _pose_id or recorded_pose
+        target = _target if _pose_id else flask_app.pose_library.get(pose_id)
+        if target is None:
+            # The pose was deleted from the database since this was recorded
+            score_data = dict.fromkeys(["score", "max_possible", "boxes_lit", "total_boxes", "incorrect_boxes"])
+        else:
+            score_data = score_keypoints(keypoints, target)
+        results.append({
+            "source": source,
+            "frame": index,
+            "time_ms": time_ms,
+            "pose_id": pose_id,
+            "person": bool((keypoints[0, 0, :, 2] > 0.3).any()),
+            **score_data,
+            "is_shrimp": None,  # settled in order by settle_shrimp(), chunks can't see each other
+            "raw_shrimp": flask_app.detect_shrimp(keypoints),
+            "recorded_score": recorded_score,
+            "recorded_shrimp": recorded_shrimp
+        })
+        keypoints_seen.append(keypoints)
+    return results, keypoints_seen
+
+
+def settle_shrimp(postures, result, keypoints):
+    """Replay one frame through its source's PostureState (source -> state in postures) to fill in is_shrimp."""
+    if result["time_ms"] is None:
+        result["is_shrimp"] = result["raw_shrimp"]  # loose images have no timeline to settle over
+        return
+    posture = postures.get(result["source"])
+    if posture is None:
+        posture = postures[result["source"]] = flask_app.PostureState()
+        if result["recorded_shrimp"]:
+            posture.shrimp = True  # the recording started mid-shrimp
+    score_data = {"score": result["score"] or 0, "max_possible": result["max_possible"] or 0}
+    posture.update(result["time_ms"] / 1000.0, keypoints, score_data, result["pose_id"])
+    result["is_shrimp"] = posture.snapshot()["isShrimp"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score recorded videos or image folders against a pose from db.json")
+    parser.add_argument("inputs", nargs="+", help="video files, directories of images and/or .pxkp keypoint recordings")
+    parser.add_argument("--pose", help="pose id from the pose database (default for recordings: the recorded pose)")
+    parser.add_argument("--db", default="db.json", help="pose database (default: %(default)s)")
+    parser.add_argument("-o", "--output", help="output file, .csv for CSV, anything else is JSONL (default: JSONL on stdout)")
+    parser.add_argument("--scoring", choices=["geometry", "pixel"], default=flask_app.SCORING_MODE,
+                        help="geometry scores straight from the body shapes, pixel rasterizes with poly() first")
+    parser.add_argument("--model-complexity", type=int, choices=[0, 1, 2], default=2)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes (default: all cores)")
+    parser.add_argument("--chunk-size", type=int, default=60, help="frames per worker task (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    with contextlib.redirect_stdout(sys.stderr):
+        library = load_pose_library(args.db)
+    if args.pose is None and not all(path.lower().endswith(RECORDING_EXTENSION) for path in args.inputs):
+        parser.error("--pose is required for videos and image folders")
+    if args.pose is not None and library.get(args.pose) is None:
+        parser.error(f"pose '{args.pose}' not found in {args.db}")
+
+    tasks = collect_tasks(args.inputs, args.chunk_size)
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    as_csv = bool(args.output) and args.output.lower().endswith(".csv")
+    writer = csv.DictWriter(out, fieldnames=FIELDS) if as_csv else None
+    if writer:
+        writer.writeheader()
+
+    # Workers are spawned so each one gets a fresh MediaPipe graph instead of a forked copy
+    context = multiprocessing.get_context("spawn")
+    frames = 0
+    postures = {}
+    try:
+        with context.Pool(args.workers, initializer=init_worker,
+                          initargs=(args.db, args.pose, args.scoring, args.model_complexity)) as pool:
+            # imap hands chunks back in order, so each source's frames reach settle_shrimp() in order
+            for results, keypoints_seen in pool.imap(score_chunk, tasks):
+                for result, keypoints in zip(results, keypoints_seen):
+                    settle_shrimp(postures, result, keypoints)
+                    if writer:
+                        writer.writerow(result)
+                    else:
+                        out.write(json.dumps(result) + "\n")
+                out.flush()
+                frames += len(results)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"Scored {frames} frames from {len(args.inputs)} inputs", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
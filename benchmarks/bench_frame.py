@@ -0,0 +1,253 @@
+"""
+Benchmark the per-frame hot path on the checked-in keypoint fixtures.
+
+    python benchmarks/bench_frame.py                           # print p50/p95/p99 per stage
+    python benchmarks/bench_frame.py --save-baseline base.json
+    python benchmarks/bench_frame.py --baseline base.json      # exit 1 if a stage got slower
+
+Each stage is timed on its own, at every quality profile resolution:
+
+    inference_stub      movenet() with a stub model that replays the fixture (frame prep + landmark unpacking)
+    polygon             draw_body() onto full-frame layers
+    glow                add_glow() over the full frame
+    occupancy_geometry  shape_occupancy() from the body shapes
+    occupancy_pixel     cell_occupancy() on the rendered poly layer
+    compositing         FrameCompositor.render_body() + compose()
+    jpeg                cv2.imencode() at the profile's quality
+    frame               render_frame() end to end
+
+It also checks that geometry and pixel scoring agree on every fixture, and
+that each profile's downsampled bloom stays visually equivalent to the
+full-resolution blur (PSNR over the glowing pixels and the worst single
+pixel), and fails if either doesn't hold. Baselines are machine specific,
+save one on the machine you compare on.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+with contextlib.redirect_stdout(sys.stderr):
+    import flask_app
+
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "keypoints.npy")
+STAGES = ["inference_stub", "polygon", "glow", "occupancy_geometry", "occupancy_pixel",
+          "compositing", "jpeg", "frame"]
+
+
+class StubPose:
+    """Stands in for mediapipe's Pose, handing back the fixture it was last pointed at."""
+
+    def __init__(self):
+        self.results = None
+
+    def set_keypoints(self, keypoints):
+        landmarks = [SimpleNamespace(y=y, x=x, visibility=v) for y, x, v in keypoints[0, 0]]
+        has_person = bool(keypoints[0, 0, :, 2].any())
+        self.results = SimpleNamespace(pose_landmarks=SimpleNamespace(landmark=landmarks) if has_person else None)
+
+    def process(self, rgb_image):
+        return self.results
+
+
+def load_fixtures(path=FIXTURE_PATH):
+    return [keypoints.astype(np.float64) for keypoints in np.load(path)]
+
+
+def percentiles(samples):
+    ms = np.array(samples) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(ms.mean()), 3)
+    }
+
+
+def bench_profile(name, fixtures, repeats, game):
+    settings = flask_app.QUALITY_PROFILES[name]
+    width, height = settings["width"], settings["height"]
+    rng = np.random.default_rng(0)
+    camera_frame = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    compositor = flask_app.FrameCompositor((height, width, 3), settings["bloom_downsample"])
+    frame_compositor = flask_app.FrameCompositor((height, width, 3), settings["bloom_downsample"])
+    pose = StubPose()
+    samples = {stage: [] for stage in STAGES}
+
+    def timed(stage, fn, *args, **kwargs):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        samples[stage].append(time.perf_counter() - start)
+        return result
+
+    for rep in range(repeats + 1):
+        if rep == 1:
+            samples = {stage: [] for stage in STAGES}  # first pass is warmup
+        for keypoints in fixtures:
+            pose.set_keypoints(keypoints)
+            timed("inference_stub", flask_app.movenet, camera_frame, pose, settings["inference_width"])
+
+            shapes = flask_app.body_shapes(keypoints, width=width, height=height)
+            image = np.zeros((height, width, 3), dtype=np.uint8)
+            glow_layer = np.zeros_like(image)
+            timed("polygon", flask_app.draw_body, image, glow_layer, shapes)
+            poly_layer = timed("glow", flask_app.add_glow, image, glow_layer, compositor.blur_size,
+                               compositor.bloom_downsample)
+
+            timed("occupancy_geometry", flask_app.shape_occupancy, flask_app.body_shapes(keypoints))
+            occupancy = timed("occupancy_pixel", flask_app.cell_occupancy, poly_layer, compositor.grid_size)
+
+            target = flask_app.target_grid(game.pose_array, *occupancy.shape)
+            start = time.perf_counter()
+            compositor.render_body(keypoints, shapes)
+            output = compositor.compose(keypoints, occupancy, target, game.dots)
+            samples["compositing"].append(time.perf_counter() - start)
+
+            timed("jpeg", cv2.imencode, ".jpg", output, [cv2.IMWRITE_JPEG_QUALITY, settings["jpeg_quality"]])
+            timed("frame", flask_app.render_frame, frame_compositor, keypoints, game)
+
+    return {stage: percentiles(values) for stage, values in samples.items()}
+
+
+def check_parity(fixtures):
+    """Return the fixture indices where geometry and pixel scoring disagree on the occupied cells."""
+    mismatches = []
+    for idx, keypoints in enumerate(fixtures):
+        shapes = flask_app.body_shapes(keypoints)
+        geometry = flask_app.shape_occupancy(shapes)
+        poly_layer = flask_app.poly(np.zeros((flask_app.HEIGHT, flask_app.WIDTH, 3), dtype=np.uint8),
+                                    keypoints, shapes=shapes)
+        pixel = flask_app.cell_occupancy(poly_layer)
+        if not np.array_equal(geometry, pixel):
+            mismatches.append(idx)
+    return mismatches
+
+
+def check_bloom(fixtures, profile, min_psnr=40.0, max_error=48):
+    """
+    Compare the profile's downsampled bloom against the full-resolution blur on every fixture.
+
+    Returns:
+        tuple: (worst PSNR in dB over pixels either version lit, worst single-channel error, ok)
+    """
+    settings = flask_app.QUALITY_PROFILES[profile]
+    width, height, downsample = settings["width"], settings["height"], settings["bloom_downsample"]
+    blur_size = flask_app.FrameCompositor((height, width, 3)).blur_size
+    worst_psnr, worst_error = float("inf"), 0
+    for keypoints in fixtures:
+        shapes = flask_app.body_shapes(keypoints, width=width, height=height)
+        if not shapes or downsample == 1:
+            continue
+        image = np.zeros((height, width, 3), dtype=np.uint8)
+        glow_layer = np.zeros_like(image)
+        flask_app.draw_body(image, glow_layer, shapes)
+        exact = flask_app.add_glow(image.copy(), glow_layer, blur_size).astype(np.int32)
+        fast = flask_app.add_glow(image.copy(), glow_layer, blur_size, downsample).astype(np.int32)
+
+        lit = (exact > 0) | (fast > 0)
+        error = np.abs(exact - fast)[lit]
+        if error.size:
+            mse = float((error.astype(np.float64) ** 2).mean())
+            worst_psnr = min(worst_psnr, 10 * np.log10(255 ** 2 / mse) if mse else float("inf"))
+            worst_error = max(worst_error, int(error.max()))
+    return worst_psnr, worst_error, worst_psnr >= min_psnr and worst_error <= max_error
+
+
+def compare(results, baseline, metric, threshold, min_delta_ms):
+    """List the stages whose metric got worse than the baseline by more than threshold (and min_delta_ms)."""
+    regressions = []
+    for profile, stages in baseline["profiles"].items():
+        for stage, stats in stages.items():
+            current = results["profiles"].get(profile, {}).get(stage)
+            if current is None:
+                continue
+            before, after = stats[metric], current[metric]
+            if after > before * (1 + threshold) and after - before > min_delta_ms:
+                regressions.append(f"{profile}/{stage}: {metric} {before:.2f}ms -> {after:.2f}ms "
+                                   f"(+{(after / before - 1) * 100 if before else float('inf'):.0f}%)")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the per-frame render/scoring path")
+    parser.add_argument("--profiles", nargs="+", choices=sorted(flask_app.QUALITY_PROFILES),
+                        default=["low", "medium", "high"], help="resolutions to run (default: all)")
+    parser.add_argument("--repeats", type=int, default=3, help="passes over the fixtures per profile")
+    parser.add_argument("--save-baseline", metavar="PATH", help="write the results as a JSON baseline")
+    parser.add_argument("--baseline", metavar="PATH", help="compare against a saved baseline, exit 1 on regression")
+    parser.add_argument("--metric", choices=["p50_ms", "p95_ms", "p99_ms", "mean_ms"], default="p50_ms",
+                        help="statistic compared against the baseline (default: %(default)s)")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed slowdown as a fraction of the baseline (default: %(default)s)")
+    parser.add_argument("--min-delta-ms", type=float, default=0.2,
+                        help="ignore slowdowns smaller than this, timer noise on tiny stages (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    fixtures = load_fixtures()
+    # Fixed target and dots so runs don't depend on which pose db.json happens to hand out
+    random.seed(0)
+    game = flask_app.GameState()
+    game.pose_array = flask_app.shape_occupancy(flask_app.body_shapes(fixtures[1]))
+
+    failed = False
+    mismatches = check_parity(fixtures)
+    if mismatches:
+        print(f"PARITY FAIL: geometry and pixel scoring disagree on fixtures {mismatches}")
+        failed = True
+    else:
+        print(f"parity ok: geometry and pixel scoring agree on all {len(fixtures)} fixtures")
+
+    for name in args.profiles:
+        psnr, error, ok = check_bloom(fixtures, name)
+        downsample = flask_app.QUALITY_PROFILES[name]["bloom_downsample"]
+        print(f"bloom {'ok' if ok else 'FAIL'}: {name} at 1/{downsample} resolution, "
+              f"worst PSNR {psnr:.1f} dB, worst pixel off by {error}")
+        failed = failed or not ok
+
+    results = {
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "opencv": cv2.__version__, "numpy": np.__version__},
+        "fixtures": len(fixtures),
+        "repeats": args.repeats,
+        "scoring_mode": flask_app.SCORING_MODE,
+        "profiles": {}
+    }
+    for name in args.profiles:
+        results["profiles"][name] = bench_profile(name, fixtures, args.repeats, game)
+        print(f"\n{name} ({flask_app.QUALITY_PROFILES[name]['width']}x{flask_app.QUALITY_PROFILES[name]['height']})")
+        print(f"  {'stage':<20}{'p50':>9}{'p95':>9}{'p99':>9}")
+        for stage, stats in results["profiles"][name].items():
+            print(f"  {stage:<20}{stats['p50_ms']:>9.2f}{stats['p95_ms']:>9.2f}{stats['p99_ms']:>9.2f}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved baseline to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.metric, args.threshold, args.min_delta_ms)
+        if regressions:
+            print("\nREGRESSIONS:")
+            for line in regressions:
+                print(f"  {line}")
+            failed = True
+        else:
+            print(f"\nno stage regressed more than {args.threshold * 100:.0f}% on {args.metric}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""
+Regenerate the synthetic keypoint fixtures used by bench_frame.py.
+
+    python benchmarks/make_fixtures.py
+
+The fixtures are checked in so benchmark runs are comparable; only rerun this
+if the fixture set itself needs to change (and save a new baseline after).
+"""
+import os
+
+import numpy as np
+
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "keypoints.npy")
+
+# Rough standing pose, (y, x) normalized to the frame, by MediaPipe landmark index
+STANDING = {
+    0: (0.25, 0.5),                       # nose
+    7: (0.24, 0.53), 8: (0.24, 0.47),     # ears
+    11: (0.38, 0.56), 12: (0.38, 0.44),   # shoulders
+    13: (0.52, 0.59), 14: (0.52, 0.41),   # elbows
+    15: (0.64, 0.6), 16: (0.64, 0.4),     # wrists
+    23: (0.62, 0.54), 24: (0.62, 0.46),   # hips
+    25: (0.8, 0.55), 26: (0.8, 0.45),     # knees
+    27: (0.97, 0.55), 28: (0.97, 0.45),   # ankles
+}
+
+
+def synthetic_person(rng, jitter=0.06):
+    """One (1, 1, 33, 3) movenet()-shaped array: a jittered, shifted and scaled standing pose."""
+    keypoints = np.zeros((1, 1, 33, 3))
+    shift_y, shift_x = rng.uniform(-0.3, 0.3, 2) * [0.3, 1]
+    scale = rng.uniform(0.6, 1.1)
+    for idx in range(33):
+        if idx in STANDING:
+            y, x = STANDING[idx]
+            keypoints[0, 0, idx] = [0.5 + (y - 0.5) * scale + shift_y + rng.normal(0, jitter),
+                                    0.5 + (x - 0.5) * scale * 0.56 + shift_x + rng.normal(0, jitter),
+                                    rng.uniform(0.2, 1.0)]
+        else:
+            # Landmarks the body outline doesn't use, mostly below the visibility threshold
+            keypoints[0, 0, idx] = [rng.uniform(0, 1), rng.uniform(0, 1), rng.uniform(0, 0.3)]
+    return keypoints
+
+
+def make_fixtures(count=48, seed=2025):
+    rng = np.random.default_rng(seed)
+    fixtures = []
+    for i in range(count):
+        if i % 12 == 0:
+            keypoints = np.zeros((1, 1, 33, 3))  # nobody in frame
+        else:
+            keypoints = synthetic_person(rng)
+            if i % 12 == 5:
+                keypoints[0, 0, :, 1] += 0.45  # partly off the right edge
+        fixtures.append(keypoints)
+    return np.stack(fixtures).astype(np.float32)
+
+
+if __name__ == "__main__":
+    fixtures = make_fixtures()
+    np.save(FIXTURE_PATH, fixtures)
+    print(f"Wrote {len(fixtures)} keypoint sets to {FIXTURE_PATH}")
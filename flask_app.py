@@ -1,23 +1,35 @@
-from flask import Flask, Response, jsonify
+from flask import Blueprint, Flask, Response, jsonify, request
 import cv2
-import tensorflow as tf
 import numpy as np
-import mediapipe as mp
-import sys, random, json
+import os, sys, random, json
+import queue, threading, time
+import bisect, itertools
+import shutil, struct, subprocess
+import multiprocessing
+from multiprocessing import shared_memory
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import math
 from flask_cors import CORS
 
 
-app = Flask(__name__)
-global test_array
-# Configure CORS to allow specific origins (your React app)
-CORS(app, resources={r"/*": {"origins": ["http://localhost:3000", "http://localhost:3004", "*"]}}, supports_credentials=True)
+# Routes hang off a blueprint so create_app() (at the bottom) can build the app without
+# touching the camera or the pose model; those start on first use or from warm_up()
+routes = Blueprint("pixelpose", __name__)
 
 # Constants from your original code - EXACTLY as in your file
+# Scoring and game logic always work in this 1920x1080 space, whatever the output profile
 HEIGHT = 1080
 WIDTH = 1920
 
-KEYPOINT_EDGE_CONNECTIONS = mp.solutions.pose.POSE_CONNECTIONS
+# mp.solutions.pose.POSE_CONNECTIONS, spelled out so drawing doesn't need mediapipe loaded
+KEYPOINT_EDGE_CONNECTIONS = [
+    (0, 1), (0, 4), (1, 2), (2, 3), (3, 7), (4, 5), (5, 6), (6, 8), (9, 10), (11, 12), (11, 13), (11, 23),
+    (12, 14), (12, 24), (13, 15), (14, 16), (15, 17), (15, 19), (15, 21), (16, 18), (16, 20), (16, 22),
+    (17, 19), (18, 20), (23, 24), (23, 25), (24, 26), (25, 27), (26, 28), (27, 29), (27, 31), (28, 30),
+    (28, 32), (29, 31), (30, 32)
+]
 
 KEYPOINT_NAMES = [
     "nose", "left_eye_inner", "left_eye", "left_eye_outer", "right_eye_inner", "right_eye", "right_eye_outer",
@@ -37,33 +49,26 @@ POLYGON_REGIONS = {
     "head": ["left_ear", "right_ear", "nose"]
 }
 
-frame_counter = 0
-
-# Initialize scrolling dot data
+# Scrolling dot data, every game with a video feed gets its own set
 NUM_DOTS = 80  # more dots!
-dot_particles = []
-
-for _ in range(NUM_DOTS):
-    dot_particles.append({
-        "x": random.randint(0, WIDTH),
-        "y": random.randint(0, HEIGHT),
-        "speed": random.uniform(1.0, 4.0),
-        "radius": random.randint(2, 5),
-        "gray": random.randint(60, 120),
-        "direction": random.choice([-1, 1])  # -1 = leftward, 1 = rightward
-    })
-
-# Initialize MediaPipe Pose
-mp_pose = mp.solutions.pose
-pose = mp_pose.Pose(static_image_mode=False, model_complexity=2)
 
-# Open the webcam
-cap = cv2.VideoCapture(0)
-if not cap.isOpened():
-    print("Cannot open webcam")
-    sys.exit(1)
-
-input_size = 256
+# MediaPipe Pose - the model and the webcam are owned by the shared FramePipeline below,
+# mediapipe itself is only imported by make_pose()
+CAMERA_INDEX = 0
+
+# Quality profiles: output resolution, pose model complexity, JPEG quality and the
+# width frames are downscaled to before inference. Pick one at startup with the
+# POSE_PROFILE env var (or --profile), switch at runtime through /profile.
+# bloom_downsample is how much the glow is shrunk before blurring (1 = full-resolution blur).
+QUALITY_PROFILES = {
+    "low": {"width": 640, "height": 360, "model_complexity": 0, "jpeg_quality": 70, "inference_width": 320,
+            "bloom_downsample": 2},
+    "medium": {"width": 1280, "height": 720, "model_complexity": 1, "jpeg_quality": 80, "inference_width": 480,
+               "bloom_downsample": 4},
+    "high": {"width": 1920, "height": 1080, "model_complexity": 2, "jpeg_quality": 90, "inference_width": 640,
+             "bloom_downsample": 4},
+}
+DEFAULT_PROFILE = os.environ.get("POSE_PROFILE", "high")
 
 
 # Functions from your original code - EXACTLY as they appeared
@@ -88,19 +93,21 @@ def draw_prediction_on_image(image, keypoints_with_scores, threshold=0.3):
     return image
 
 
-def draw_pixel_frames(image):
+def draw_pixel_frames(image, grid_size=120):
     height, width, _ = image.shape
-    for idx1 in range(width):
-        if (idx1 % 120 == 0):
-            cv2.line(image, (idx1, 0), (idx1, HEIGHT), (50, 50, 50), 2)
-    for idx2 in range(height):
-        if (idx2 % 120 == 0):
-            cv2.line(image, (0, idx2), (WIDTH, idx2), (50, 50, 50), 2)
+    for idx1 in range(0, width, grid_size):
+        cv2.line(image, (idx1, 0), (idx1, height), (50, 50, 50), 2)
+    for idx2 in range(0, height, grid_size):
+        cv2.line(image, (0, idx2), (width, idx2), (50, 50, 50), 2)
     return image
 
-def movenet(input_image):
-    input_image_np = input_image.numpy()[0].astype(np.uint8)
-    rgb_image = cv2.cvtColor(input_image_np, cv2.COLOR_BGR2RGB)
+def movenet(frame, pose, inference_width=None):
+    # MediaPipe does its own resizing, so just shrink big camera frames once and hand them over.
+    # Landmarks come back normalized to the whole frame.
+    height, width, _ = frame.shape
+    if inference_width and width > inference_width:
+        frame = cv2.resize(frame, (inference_width, height * inference_width // width), interpolation=cv2.INTER_AREA)
+    rgb_image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
     results = pose.process(rgb_image)
     keypoints_with_scores = np.zeros((1, 1, 33, 3))
 
@@ -113,30 +120,40 @@ def movenet(input_image):
     return keypoints_with_scores
 
 
-def poly(image, keypoints, threshold=0.3):
+def body_shapes(keypoints, threshold=0.3, width=WIDTH, height=HEIGHT):
+    """
+    Build the body outline poly() draws, in pixel coordinates of a width x height frame.
+
+    Each shape is a (kind, geometry, thickness, glow_thickness) tuple where kind is
+    "polygon" (geometry is an int32 point array), "circle" (geometry is (center, radius))
+    or "line" (geometry is (pt1, pt2)). Thickness follows OpenCV, -1 means filled.
+    Stroke widths scale with the frame height.
+    """
     named_keypoints = {}
     keypoints = keypoints[0, 0,:,:]
+    scale = height / HEIGHT
+
+    def stroke(px):
+        return max(int(round(px * scale)), 1)
 
     for idx, name in enumerate(KEYPOINT_NAMES):
         y, x, conf = keypoints[idx]
         if conf > threshold:
-            named_keypoints[name] = (int(x * WIDTH), int(y * HEIGHT))
+            named_keypoints[name] = (int(x * width), int(y * height))
 
-    glow_layer = np.zeros_like(image)
+    shapes = []
 
     # Torso
     torso_pts = [named_keypoints[pt] for pt in POLYGON_REGIONS["torso"] if pt in named_keypoints]
     if len(torso_pts) >= 3:
-        cv2.fillPoly(glow_layer, [np.array(torso_pts, dtype=np.int32)], color=(0, 255, 255))
-        cv2.fillPoly(image, [np.array(torso_pts, dtype=np.int32)], color=(255, 255, 255))
+        shapes.append(("polygon", np.array(torso_pts, dtype=np.int32), -1, -1))
 
     # Face circle
     if "nose" in named_keypoints and ("left_ear" in named_keypoints or "right_ear" in named_keypoints):
         outer_face_point = named_keypoints.get("left_ear") or named_keypoints.get("right_ear")
         nose_point = named_keypoints["nose"]
         radius = int(math.dist(nose_point, outer_face_point))
-        cv2.circle(glow_layer, nose_point, radius, (0, 255, 255), -1)
-        cv2.circle(image, nose_point, radius, (255, 255, 255), -1)
+        shapes.append(("circle", (nose_point, radius), -1, -1))
 
     # Limbs
     for segment in [
@@ -150,6 +167,8 @@ def poly(image, keypoints, threshold=0.3):
             x1, y1 = named_keypoints[p1_name]
             x2, y2 = named_keypoints[p2_name]
             v = np.array([x2 - x1, y2 - y1])
+            if not v.any():
+                continue  # zero-length limb, there's no box to draw
             v_norm = v / np.linalg.norm(v)
             perp = np.array([-v_norm[1], v_norm[0]])
             box_width = 0.2 * np.linalg.norm(v)
@@ -160,16 +179,16 @@ def poly(image, keypoints, threshold=0.3):
             p2b = np.array([x2, y2]) - offset
             p2a = np.array([x2, y2]) + offset
 
-            box_pts = np.array([p1a, p1b, p2b, p2a], dtype=np.int32).reshape((-1, 1, 2))
-            cv2.fillPoly(glow_layer, [box_pts], color=(0, 255, 255))
-            cv2.fillPoly(image, [box_pts], color=(255, 255, 255))
+            box_pts = np.array([p1a, p1b, p2b, p2a], dtype=np.int32)
+            shapes.append(("polygon", box_pts, -1, -1))
 
     # Neck
     if all(k in named_keypoints for k in ["nose", "left_shoulder", "right_shoulder"]):
         x_neck = (named_keypoints["left_shoulder"][0] + named_keypoints["right_shoulder"][0]) / 2
         y_neck = (named_keypoints["left_shoulder"][1] + named_keypoints["right_shoulder"][1]) / 2
-        cv2.line(glow_layer, (int(x_neck), int(y_neck)), (int(named_keypoints["nose"][0]), int(named_keypoints["nose"][1])), (0, 255, 255), 50)
-        cv2.line(image, (int(x_neck), int(y_neck)), (int(named_keypoints["nose"][0]), int(named_keypoints["nose"][1])), (255, 255, 255), 50)
+        neck = (int(x_neck), int(y_neck))
+        nose = (int(named_keypoints["nose"][0]), int(named_keypoints["nose"][1]))
+        shapes.append(("line", (neck, nose), stroke(50), stroke(50)))
 
     # --- Helmet (with glow) ---
     if all(k in named_keypoints for k in ["nose", "left_ear", "right_ear"]):
@@ -180,11 +199,8 @@ def poly(image, keypoints, threshold=0.3):
         helmet_center = nose
         helmet_radius = int(max(math.dist(nose, left_ear), math.dist(nose, right_ear)) * 1.6)
 
-        # Glow layer gets the outer glow
-        cv2.circle(glow_layer, helmet_center, int(helmet_radius * 0.75), (0, 255, 255), thickness=6)
-
-        # Main image gets the solid helmet
-        cv2.circle(image, helmet_center, int(helmet_radius * 0.75), (255, 255, 255), thickness=-1)
+        # Solid helmet on the main image, outer glow ring on the glow layer
+        shapes.append(("circle", (helmet_center, int(helmet_radius * 0.75)), -1, stroke(6)))
     
     # --- Palm Rings (1 per hand, proportional to forearm) ---
     for side in ["left", "right"]:
@@ -197,106 +213,648 @@ def poly(image, keypoints, threshold=0.3):
             forearm_len = math.dist((cx, cy), (ex, ey))
             ring_radius = int(forearm_len * 0.2)
 
-            # White ring on main image
-            cv2.circle(image, (cx, cy), ring_radius, (255, 255, 255), thickness=4)
+            # White ring on main image, slightly wider glow ring
+            shapes.append(("circle", ((cx, cy), ring_radius), stroke(4), stroke(6)))
 
-            # Optional glow on glow layer
-            cv2.circle(glow_layer, (cx, cy), ring_radius, (0, 255, 255), thickness=6)
+    return shapes
 
-    # Blur for glow
-    blurred_glow = cv2.GaussianBlur(glow_layer, (51, 51), sigmaX=0, sigmaY=0)
 
-    # Overlay glow onto image
-    image = cv2.addWeighted(image, 1.0, blurred_glow, 0.6, 0)
+def draw_shape(image, kind, geometry, thickness, color, offset=(0, 0)):
+    """Draw one body_shapes() entry, shifted by offset pixels."""
+    dx, dy = offset
+    if kind == "polygon":
+        cv2.fillPoly(image, [geometry + np.array([dx, dy], dtype=np.int32)], color=color)
+    elif kind == "circle":
+        (cx, cy), radius = geometry
+        cv2.circle(image, (cx + dx, cy + dy), radius, color, thickness)
+    else:
+        (x1, y1), (x2, y2) = geometry
+        cv2.line(image, (x1 + dx, y1 + dy), (x2 + dx, y2 + dy), color, thickness)
 
-    return image
 
+def draw_body(image, glow_layer, shapes, offset=(0, 0)):
+    """Draw the white body shapes onto image and their wider yellow outline onto glow_layer."""
+    for kind, geometry, thickness, glow_thickness in shapes:
+        draw_shape(glow_layer, kind, geometry, glow_thickness, (0, 255, 255), offset)
+        draw_shape(image, kind, geometry, thickness, (255, 255, 255), offset)
 
-def draw_scrolling_dots(image):
-    for dot in dot_particles:
-        x, y = int(dot["x"]), int(dot["y"])
-        radius = dot["radius"]
-        color = (dot["gray"], dot["gray"], dot["gray"])
-        cv2.circle(image, (x, y), radius, color, -1)
-    return image
 
+def add_glow(image, glow_layer, blur_size=51, downsample=1, small=None, blurred=None):
+    """
+    Blur glow_layer and blend it onto image (in place), returns image.
 
-def load_pose_database(filename='db.json'):
-    try:
-        with open(filename, 'r') as file:
-            data = json.load(file)
-        return data
-    except Exception as e:
-        print(f"Error loading pose database: {e}")
-        return None
+    With downsample > 1 the blur runs on a 1/downsample size copy with the sigma
+    scaled to match and is upsampled back, which looks the same for a glow this
+    soft at a fraction of the cost. small and blurred are optional scratch arrays
+    for the downsampled and full-size blur, used when they have the right shape.
+    """
+    height, width = glow_layer.shape[:2]
+    if downsample > 1:
+        # Same sigma OpenCV derives from the full-size kernel, scaled down with the image
+        sigma = (0.3 * ((blur_size - 1) * 0.5 - 1) + 0.8) / downsample
+        small = cv2.resize(glow_layer, (max(width // downsample, 1), max(height // downsample, 1)),
+                           dst=small, interpolation=cv2.INTER_AREA)
+        small = cv2.GaussianBlur(small, (0, 0), sigmaX=sigma, sigmaY=sigma, dst=small)
+        blurred_glow = cv2.resize(small, (width, height), dst=blurred, interpolation=cv2.INTER_LINEAR)
+    else:
+        # Blur for glow
+        blurred_glow = cv2.GaussianBlur(glow_layer, (blur_size, blur_size), sigmaX=0, sigmaY=0, dst=blurred)
 
-# Get a random binary pose array from the database
-def get_random_pose_array():
-    data = load_pose_database()
+    # Overlay glow onto image
+    return cv2.addWeighted(image, 1.0, blurred_glow, 0.6, 0, dst=image)
 
-    # Select a random pose from the database
-    random_pose = random.choice(data['poses'])
-    
-    # Extract the drawnPose (binary array)
-    pose_array = random_pose['drawnPose']
-    
-    # Print which pose ID was selected
-    print(f"Selected pose ID: {random_pose['id']}")
-    
-    return pose_array
 
-# Initialize test_array with a random pose from the database
-test_array = get_random_pose_array()
+def poly(image, keypoints, threshold=0.3, shapes=None, offset=(0, 0), blur_size=51, downsample=1, glow_layer=None,
+         small=None, blurred=None):
+    # image may be a crop of the frame, offset shifts frame coordinates into it.
+    # glow_layer, if given, is a blank scratch buffer the size of image to reuse,
+    # small and blurred are handed to add_glow() the same way.
+    if shapes is None:
+        shapes = body_shapes(keypoints, threshold)
 
+    if glow_layer is None:
+        glow_layer = np.zeros_like(image)
+    draw_body(image, glow_layer, shapes, offset)
+    return add_glow(image, glow_layer, blur_size, downsample, small, blurred)
+
+
+class DotParticles:
+    """
+    The scrolling background dots, one NumPy array per attribute.
+
+    Positions are in WIDTH x HEIGHT coordinates. update() moves and respawns
+    every dot at once, draw() adds them all onto a frame in one scatter, so
+    thousands of dots cost about the same Python time as a handful.
+    """
+
+    def __init__(self, count=NUM_DOTS, seed=None):
+        self.rng = np.random.default_rng(seed)
+        self.count = count
+        self.x = self.rng.integers(0, WIDTH + 1, count).astype(np.float64)
+        self.y = self.rng.integers(0, HEIGHT + 1, count)
+        self.speed = np.empty(count)
+        self.radius = np.empty(count, dtype=np.int64)
+        self.gray = np.empty(count, dtype=np.int64)
+        self.direction = np.empty(count, dtype=np.int64)  # -1 = leftward, 1 = rightward
+        self._respawn(np.ones(count, dtype=bool))
+        self._disks = {}  # (radius, row stride) -> flat offsets of a filled circle
+        self._owner = None  # padded per-pixel scratch for draw(): 1 + index of the last dot on it
+
+    def _respawn(self, mask):
+        n = int(np.count_nonzero(mask))
+        self.speed[mask] = self.rng.uniform(1.0, 4.0, n)
+        self.radius[mask] = self.rng.integers(2, 6, n)
+        self.gray[mask] = self.rng.integers(60, 121, n)
+        self.direction[mask] = self.rng.choice([-1, 1], n)
+
+    def update(self):
+        self.x += self.speed * self.direction
+
+        # Reset off-screen dots
+        gone = (self.x < 0) | (self.x > WIDTH)
+        if gone.any():
+            self.x[gone] = np.where(self.direction[gone] > 0, 0, WIDTH)
+            self.y[gone] = self.rng.integers(0, HEIGHT + 1, int(np.count_nonzero(gone)))
+            self._respawn(gone)
+
+    def _disk(self, radius, stride):
+        offsets = self._disks.get((radius, stride))
+        if offsets is None:
+            # Rasterize with cv2.circle once so the dots look exactly like they always did
+            patch = np.zeros((2 * radius + 1, 2 * radius + 1), dtype=np.uint8)
+            cv2.circle(patch, (radius, radius), radius, 1, -1)
+            dy, dx = np.nonzero(patch)
+            offsets = self._disks[(radius, stride)] = (dy - radius) * stride + (dx - radius)
+        return offsets
+
+    def draw(self, image, mirror=False, scale=1.0):
+        """
+        Add the dots onto image (saturating), mirrored horizontally if image is an already flipped frame.
+
+        Returns:
+            ndarray: uint8 (height, width) mask, nonzero where a dot was drawn
+        """
+        height, width, _ = image.shape
+        xs = (self.x * scale).astype(np.int64)
+        ys = (self.y * scale).astype(np.int64)
+        radii = np.maximum(np.rint(self.radius * scale).astype(np.int64), 1)
+        if mirror:
+            xs = width - 1 - xs  # the disks are symmetric, so only the centres move
+
+        # Stamp every dot into one single-channel layer padded by the largest radius, so no disk
+        # needs clipping, then add that layer onto the frame once. Fancy indexing the 3-channel
+        # frame pixel by pixel was the slow part; this costs a couple of full-frame cv2 passes.
+        pad = int(radii.max(initial=0)) + 1
+        shape = (height + 2 * pad, width + 2 * pad)
+        if self._owner is None or self._owner.shape != shape:
+            self._owner = np.zeros(shape, dtype=np.int32)
+        stride = shape[1]
+        centres = (ys + pad) * stride + xs + pad
+        layer = np.zeros(shape, dtype=np.uint8)
+        pixel_idx, owners = [], []
+        for radius in np.unique(radii):
+            sel = np.flatnonzero(radii == radius)
+            disk = self._disk(int(radius), stride)
+            pixel_idx.append((centres[sel, None] + disk).ravel())
+            owners.append(np.repeat(sel + 1, len(disk)))
+        if pixel_idx:
+            # A later dot covers an earlier one, like cv2.circle-ing them one after another onto
+            # one layer: each pixel takes the gray of the last dot on it
+            pixels = np.concatenate(pixel_idx)
+            owner = self._owner.reshape(-1)
+            np.maximum.at(owner, pixels, np.concatenate(owners).astype(np.int32))
+            layer.reshape(-1)[pixels] = self.gray[owner[pixels] - 1]  # every write to a pixel is the same
+            owner[pixels] = 0
+
+        layer = layer[pad:pad + height, pad:pad + width]
+        cv2.add(image, cv2.cvtColor(layer, cv2.COLOR_GRAY2BGR), dst=image)
+        return layer
+
+
+def draw_scrolling_dots(image, dots, mirror=False, scale=1.0):
+    """
+    Add the background dots onto image, mirrored horizontally if image is an already flipped frame.
+    Dots live in WIDTH x HEIGHT coordinates, scale maps them onto image.
+
+    Returns:
+        ndarray or None: uint8 mask of the pixels that were drawn on, None without dots
+    """
+    if dots is None:
+        return None
+    return dots.draw(image, mirror, scale)
 
 
 # game functionality
-def gridcheck(image):
-    global test_array  # Add this line to the beginning of gridcheck
-    
-    height, width, _ = image.shape
-    grid_size = 120
-    grid_color = (0, 200, 0)
-    thickness = 2
+GRID_SIZE = 120  # pixel size of one scoring cell, 1920x1080 -> 9 rows x 16 cols
+
 
-    white_mask = np.all(image == [255, 255, 255], axis=-1)
+def cell_occupancy(image, grid_size=GRID_SIZE):
+    """
+    Reduce a poly() render to a rows x cols grid of cells the player is in.
+
+    The white-pixel mask is built once as a single channel and collapsed per cell
+    with one reshape/reduce instead of slicing every cell in Python.
 
+    Returns:
+        np.ndarray: boolean (rows, cols) occupancy grid
+    """
+    height, width, _ = image.shape
     rows = height // grid_size
     cols = width // grid_size
 
-    # Create a transparent overlay image for half transparency
-    overlay = image.copy()
+    white_mask = cv2.inRange(image[:rows * grid_size, :cols * grid_size], (255, 255, 255), (255, 255, 255))
+    return white_mask.reshape(rows, grid_size, cols, grid_size).max(axis=(1, 3)) > 0
 
-    for row in range(rows):
-        for col in range(cols):
-            x = col * grid_size
-            y = row * grid_size
 
-            # Check corresponding cell in test_array (you might need to scale or adjust based on resolution)
-            test_row = min(row * len(test_array) // rows, len(test_array) - 1)
-            test_col = min(col * len(test_array[0]) // cols, len(test_array[0]) - 1)
-            
-            if test_array[test_row][test_col] == 1:  # Color red if the cell value is 1
-                cv2.rectangle(overlay, (x, y), (x + grid_size, y + grid_size), (80, 80, 0), thickness=-1)
+def target_grid(pose_array, rows, cols):
+    """Sample a drawnPose grid down (or up) to the rows x cols scoring grid as a boolean array."""
+    pose_array = np.asarray(pose_array)
+    if pose_array.dtype == bool and pose_array.shape == (rows, cols):
+        return pose_array  # already sampled, e.g. from the PoseLibrary
+    test_rows = np.minimum(np.arange(rows) * len(pose_array) // rows, len(pose_array) - 1)
+    test_cols = np.minimum(np.arange(cols) * pose_array.shape[1] // cols, pose_array.shape[1] - 1)
+    return pose_array[np.ix_(test_rows, test_cols)] == 1
 
-            region = white_mask[y:y + grid_size, x:x + grid_size]
-            has_white = np.any(region)
 
-            if not has_white:
-                continue
+def load_pose_database(filename='db.json'):
+    """Strictly parse the pose database. Raises OSError or ValueError (incl. JSONDecodeError) on failure."""
+    with open(filename, 'r') as file:
+        return json.load(file)
+
+
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+DUPLICATE_JACCARD = 0.9  # poses at least this similar on the scoring grid count as the same pose
+
+
+def pack_grids(grids):
+    """Pack boolean (n, rows, cols) grids into fixed-width bitsets, (n, words) uint64 zero padded."""
+    grids = np.asarray(grids, dtype=bool)
+    packed = np.packbits(grids.reshape(len(grids), int(np.prod(grids.shape[1:]))), axis=1)
+    words = -(-packed.shape[1] // 8)
+    padded = np.zeros((len(grids), words * 8), dtype=np.uint8)
+    padded[:, :packed.shape[1]] = packed
+    return padded.view(np.uint64)
+
+
+def popcount(words):
+    """Number of set bits in each row of a (n, words) uint64 array."""
+    if hasattr(np, "bitwise_count"):  # numpy 2
+        return np.bitwise_count(words).sum(axis=1, dtype=np.int64)
+    return POPCOUNT[np.ascontiguousarray(words).view(np.uint8)].sum(axis=1, dtype=np.int64)
+
+
+def grid_fingerprint(grid):
+    """Hex of a boolean scoring grid's bitset."""
+    return pack_grids([grid]).tobytes().hex()
+
+
+def parse_pose_database(filename, rows, cols):
+    """
+    Load filename and sample every drawnPose to the rows x cols scoring grid: the slow
+    part of PoseLibrary.refresh(), a plain function so the reload worker can run it.
+
+    Returns:
+        tuple: (pose ids, boolean (n, rows, cols) grids, {pose id: stored feasibility verdict})
+        where only verdicts that still match their pose's grid are kept
+    Raises OSError or ValueError (incl. JSONDecodeError) if the file can't be loaded.
+    """
+    data = load_pose_database(filename)
+    grids, feasibility = {}, {}
+    for pose in data.get('poses', []):
+        pose_id = pose.get('id')
+        try:
+            pose_array = np.asarray(pose.get('drawnPose'), dtype=np.int8)
+        except (TypeError, ValueError):
+            pose_array = None
+        if pose_array is None or pose_array.ndim != 2 or pose_array.size == 0:
+            print(f"Skipping pose {pose_id}: drawnPose is not a rectangular 0/1 grid")
+            continue
+        grids[pose_id] = grid = target_grid(pose_array, rows, cols)
+        verdict = pose.get('feasibility')
+        if (isinstance(verdict, dict) and isinstance(verdict.get('feasible'), bool)
+                and verdict.get('grid') == grid_fingerprint(grid)):
+            feasibility[pose_id] = verdict  # a verdict from before an edit doesn't count
+        else:
+            feasibility.pop(pose_id, None)
+    # One stacked array pickles back from the worker much faster than thousands of small ones
+    return list(grids), np.array(list(grids.values()), dtype=bool).reshape(len(grids), rows, cols), feasibility
+
+
+_reload_pool = None
+_reload_pool_lock = threading.Lock()
+
+
+def _reload_executor(broken=None):
+    """
+    The single spawned process PoseLibrary reloads parse db.json in, started on first use
+    (and again if `broken`, a pool that died, is the current one). None in a daemonic
+    process (station and batch workers), which can't have children.
+    """
+    global _reload_pool
+    with _reload_pool_lock:
+        if broken is not None and broken is _reload_pool:
+            _reload_pool = None
+        elif _reload_pool is None and not multiprocessing.current_process().daemon:
+            _reload_pool = ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn"))
+        return _reload_pool
+
+
+class PoseLibrary:
+    """
+    The poses in db.json, parsed once and pre-sampled to the scoring grid.
+
+    The file is only re-read when its mtime changes. Parse errors are reported
+    when the file is loaded and the previously loaded poses stay in use.
+
+    Every grid is also packed into a bitset (144 cells -> 3 uint64 words), so
+    comparing a grid against the whole library is a few vectorized AND/OR +
+    popcounts: similar() for top-k Jaccard/Hamming neighbours, find_duplicate()
+    to turn away re-submissions, next_pose() to pick a different pose of about
+    the same difficulty (number of cells to fill).
+
+    Feasibility verdicts aren't computed here, PoseValidator is far too slow to
+    run next to the game loop. POST /poses/check hands one out at submission
+    time, the frontend saves it with the pose as "feasibility", and
+    `flask_app.py --check-poses` fills in the rest offline. A verdict only
+    counts while its fingerprint matches the pose's grid, and the rotation
+    skips the poses no body layout can fill.
+    """
+
+    def __init__(self, filename='db.json', rows=HEIGHT // GRID_SIZE, cols=WIDTH // GRID_SIZE):
+        self.filename = filename
+        self.rows = rows
+        self.cols = cols
+        self.grids = {}  # pose id -> boolean (rows, cols) grid
+        self._index = self._build_index({})  # (ids, bitsets, cell counts), swapped as a whole
+        self._mtime = None
+        self._lock = threading.Lock()
+        self.feasibility = {}  # pose id -> stored verdict that still matches its grid
+        self._reloader = None
+
+    def fingerprint(self, grid):
+        """Hex of a drawnPose (or scoring grid) sampled to the scoring grid, ties a stored verdict to it."""
+        return grid_fingerprint(target_grid(grid, self.rows, self.cols))
+
+    def verdict(self, grid, result):
+        """The "feasibility" entry to store with a pose, from a PoseValidator result on it."""
+        return {"grid": self.fingerprint(grid), "feasible": bool(result["feasible"]), "ratio": result["ratio"],
+                "score": result["score"], "max_possible": result["max_possible"]}
+
+    def feasible(self, pose_id):
+        """False if pose_id is known to be impossible to fill, True if it's fine or not checked yet."""
+        verdict = self.feasibility.get(pose_id)
+        return verdict is None or verdict["feasible"]
+
+    def refresh_in_background(self):
+        """
+        refresh() on a background thread, for the render loop: re-parsing a big db.json takes
+        long enough to stall the stream. Only the very first load happens in place, there's
+        nothing to pick from before it.
+        """
+        if self._mtime is None:
+            self.refresh()
+        elif self._reloader is None or not self._reloader.is_alive():
+            self._reloader = threading.Thread(target=self.refresh, kwargs={"in_worker": True},
+                                              name="pose-library-reload", daemon=True)
+            self._reloader.start()
+
+    def refresh(self, in_worker=False):
+        """
+        Reload the file if it changed on disk. Returns True if the library was reloaded.
+
+        With in_worker the file is parsed in the reload worker process: json.loads holds
+        the GIL for the whole parse, so parsing a big db.json on a thread still stalls
+        every other thread of this process.
+        """
+        try:
+            mtime = os.stat(self.filename).st_mtime_ns
+        except OSError as e:
+            if self._mtime != -1:
+                print(f"Error loading pose database: {e}")
+                self._mtime = -1
+            return False
+
+        with self._lock:
+            if mtime == self._mtime:
+                return False
+            self._mtime = mtime
+
+            try:
+                pool = _reload_executor() if in_worker else None
+                try:
+                    if pool is None:
+                        raise BrokenProcessPool
+                    ids, stacked, feasibility = pool.submit(parse_pose_database, self.filename,
+                                                            self.rows, self.cols).result()
+                except RuntimeError:  # no worker here, or it died / couldn't start: parse in place
+                    if pool is not None:
+                        _reload_executor(broken=pool)
+                    ids, stacked, feasibility = parse_pose_database(self.filename, self.rows, self.cols)
+            except (OSError, ValueError) as e:
+                print(f"Error loading pose database {self.filename}: {e}")
+                return False
+
+            grids = dict(zip(ids, stacked))
+            self.grids = grids
+            self._index = self._build_index(grids)
+            self.feasibility = feasibility
+            impossible = [pose_id for pose_id, verdict in feasibility.items() if not verdict["feasible"]]
+            print(f"Loaded {len(grids)} poses from {self.filename}"
+                  + (f", leaving {len(impossible)} impossible ones out of the rotation" if impossible else ""))
+            return True
+
+    def _build_index(self, grids):
+        ids = list(grids)
+        bits = pack_grids([grids[pose_id] for pose_id in ids] or np.zeros((0, self.rows, self.cols), dtype=bool))
+        return ids, bits, popcount(bits)
+
+    def _compare(self, grid):
+        """(ids, cell counts, intersection and union sizes) of every pose against a drawnPose or scoring grid."""
+        ids, bits, cells = self._index
+        query = target_grid(grid, self.rows, self.cols)
+        inter = popcount(bits & pack_grids([query]))
+        return ids, cells, inter, cells + np.count_nonzero(query) - inter
+
+    def similar(self, grid, k=5, metric="jaccard", exclude=None):
+        """
+        The k poses closest to `grid` (a drawnPose or scoring grid), best first.
+
+        metric "jaccard" ranks by shared / combined cells, "hamming" by the number of
+        cells that differ. Returns a list of {"id", "jaccard", "hamming"} dicts.
+        """
+        ids, _, inter, union = self._compare(grid)
+        jaccard = np.where(union > 0, inter / np.maximum(union, 1), 1.0)
+        hamming = union - inter
+        keys = -jaccard if metric == "jaccard" else hamming
+        if exclude is not None and exclude in ids:
+            keys = keys.astype(np.float64)
+            keys[ids.index(exclude)] = np.inf
+
+        k = min(k, len(ids) - (exclude in ids))
+        if k <= 0:
+            return []
+        top = np.argpartition(keys, k - 1)[:k] if k < len(ids) else np.arange(len(ids))
+        top = top[np.lexsort((hamming[top], keys[top]))]
+        return [{"id": ids[i], "jaccard": round(float(jaccard[i]), 4), "hamming": int(hamming[i])} for i in top]
+
+    def find_duplicate(self, grid, threshold=DUPLICATE_JACCARD):
+        """The closest pose if it's at least `threshold` Jaccard-similar to `grid`, else None."""
+        best = self.similar(grid, k=1)
+        return best[0] if best and best[0]["jaccard"] >= threshold else None
+
+    def next_pose(self, current_id=None, tolerance=0.25):
+        """
+        Returns (pose_id, grid) for a random pose of similar difficulty to current_id:
+        within `tolerance` of its cell count and not a near-duplicate of it. Falls back
+        to any other pose, then to random_pose(), when nothing qualifies.
+        """
+        current = self.grids.get(current_id)
+        if current is None:
+            return self.random_pose()
+
+        ids, cells, inter, union = self._compare(current)
+        if len(ids) < 2:
+            return self.random_pose()
+        others = np.ones(len(ids), dtype=bool)
+        if current_id in ids:
+            others[ids.index(current_id)] = False
+        size = int(np.count_nonzero(current))
+        close = np.abs(cells - size) <= max(2, tolerance * size)
+        different = inter < DUPLICATE_JACCARD * union
+        possible = np.array([self.feasible(pose_id) for pose_id in ids])
+        for candidates in (others & close & different & possible, others & different & possible,
+                           others & possible, others):
+            if candidates.any():
+                pose_id = ids[random.choice(np.flatnonzero(candidates).tolist())]
+                grid = self.grids.get(pose_id)  # None if a reload swapped it out just now
+                return (pose_id, grid) if grid is not None else self.random_pose()
+        return self.random_pose()
+
+    def get(self, pose_id):
+        return self.grids.get(pose_id)
+
+    def ids(self):
+        return list(self.grids)
+
+    def random_pose(self):
+        """
+        Returns (pose_id, grid) for a random pose, or (None, None) if the library is empty.
+        Poses known to be impossible are only picked when there's nothing else.
+        """
+        grids = self.grids
+        if not grids:
+            return None, None
+        ids = [pose_id for pose_id in grids if self.feasible(pose_id)] or list(grids)
+        pose_id = random.choice(ids)
+        return pose_id, grids[pose_id]
+
+
+pose_library = PoseLibrary()
+
+
+class GameState:
+    """
+    One game: the target pose and how long it's been up, recent scores and the background dots.
+
+    The camera game and every remote player get their own, so they rotate poses
+    and animate independently of each other.
+    """
+
+    SCORE_PRINT_INTERVAL = 30  # Print score every 30 frames (about once per second at 30fps)
+    POSE_CHANGE_INTERVAL = 30 * 30  # Change pose every 30 seconds (assuming 30fps)
+
+    def __init__(self, particles=True, history=300, verbose=False):
+        self.verbose = verbose
+        self.pose_id = None
+        self.frame_counter = 0
+        self.score_history = deque(maxlen=history)
+        self.dots = DotParticles() if particles else None
+        self.change_pose()
+
+    def change_pose(self):
+        """
+        Move on to a different target pose of about the same difficulty (random for the first one).
+        Picks from the library as loaded; edits to db.json are picked up in the background.
+        """
+        pose_library.refresh_in_background()
+        pose_id, pose_array = pose_library.next_pose(self.pose_id)
+        if pose_id is None:
+            if self.verbose:
+                print("No poses available, using an empty target")
+            pose_array = np.zeros((pose_library.rows, pose_library.cols), dtype=bool)
+        elif self.verbose:
+            print(f"Selected pose ID: {pose_id}")
+
+        self.pose_id = pose_id
+        self.pose_array = pose_array
+        self.pose_started = time.time()
+
+    def advance(self, score_data):
+        """Tick the frame counter, rotate the target pose and move the dots."""
+        self.score_history.append(score_data["score"])
+
+        # Print score to stdout at specified interval to avoid flooding
+        if self.frame_counter % self.SCORE_PRINT_INTERVAL == 0:
+            if self.verbose:
+                print(f"Score: {score_data['score']} / {score_data['max_possible']} | Boxes: {score_data['boxes_lit']} / {score_data['total_boxes']}")
+
+            # Only check for pose change when already printing score to reduce frequency
+            if self.frame_counter > 0 and self.frame_counter % self.POSE_CHANGE_INTERVAL == 0:
+                try:
+                    self.change_pose()
+                    if self.verbose:
+                        print("Changed to new pose!")
+                except Exception as e:
+                    print(f"Error changing pose: {e}")
+
+        if self.dots is not None:
+            self.dots.update()
+
+        self.frame_counter += 1  # move dots
+
+
+# Scoring straight from body_shapes(): the shapes are drawn on a single-channel
+# scratch that covers just their bounds, grown out to whole cells. The scratch
+# edges then only clip a shape where the frame edges would (OpenCV clips and
+# re-slopes polygon edges against the image bounds, so a tighter crop wouldn't
+# rasterize like poly() does), and each cell is a max over 8-pixel words. The
+# result matches cell_occupancy() of the poly() render without drawing the
+# 3-channel frame or the glow, or touching the rest of the frame.
+SCORING_MODE = "geometry"  # or "pixel" to score from the rendered poly layer
+
+
+def _shape_bounds(kind, geometry, thickness):
+    """Pixel bounding box (x_min, y_min, x_max, y_max) a shape can paint into."""
+    if kind == "polygon":
+        (x_min, y_min), (x_max, y_max) = geometry.min(axis=0), geometry.max(axis=0)
+        return x_min, y_min, x_max, y_max
+    if kind == "circle":
+        (cx, cy), radius = geometry
+        reach = radius + max(thickness, 0) / 2 + 1
+        return cx - reach, cy - reach, cx + reach, cy + reach
+    (x1, y1), (x2, y2) = geometry
+    reach = thickness / 2 + 1
+    return min(x1, x2) - reach, min(y1, y2) - reach, max(x1, x2) + reach, max(y1, y2) + reach
+
+
+def shape_occupancy(shapes):
+    """
+    Cell occupancy of the white body layer, computed from body_shapes() geometry.
+
+    Returns:
+        np.ndarray: boolean (rows, cols) grid, same as cell_occupancy(poly(...))
+    """
+    rows, cols = HEIGHT // GRID_SIZE, WIDTH // GRID_SIZE
+    occupancy = np.zeros((rows, cols), dtype=bool)
+    if not shapes:
+        return occupancy
+
+    bounds = np.array([_shape_bounds(kind, geometry, thickness) for kind, geometry, thickness, _ in shapes])
+    x_min, y_min = bounds[:, :2].min(axis=0)
+    x_max, y_max = bounds[:, 2:].max(axis=0)
+    c0, r0 = max(int(x_min) // GRID_SIZE - 1, 0), max(int(y_min) // GRID_SIZE - 1, 0)
+    c1, r1 = min(int(x_max) // GRID_SIZE + 2, cols), min(int(y_max) // GRID_SIZE + 2, rows)
+    if c1 <= c0 or r1 <= r0:
+        return occupancy  # nothing on screen
+
+    scratch = np.zeros(((r1 - r0) * GRID_SIZE, (c1 - c0) * GRID_SIZE), dtype=np.uint8)
+    for kind, geometry, thickness, _ in shapes:
+        draw_shape(scratch, kind, geometry, thickness, 255, offset=(-c0 * GRID_SIZE, -r0 * GRID_SIZE))
+    words = scratch.view(np.uint64) if GRID_SIZE % 8 == 0 else scratch
+    lit = words.reshape(r1 - r0, GRID_SIZE, -1).max(axis=1).reshape(r1 - r0, c1 - c0, -1).any(axis=2)
+    occupancy[r0:r1, c0:c1] = lit
+    return occupancy
+
+
+def score_keypoints(keypoints, pose_array, threshold=0.3):
+    """Score keypoints against the pose_array target without rendering anything."""
+    return score_occupancy(shape_occupancy(body_shapes(keypoints, threshold)), pose_array)
+
+
+def gridcheck(image, occupancy=None, target=None, origin=(0, 0), grid_size=GRID_SIZE):
+    """
+    Shade the target cells and outline the occupied ones, in place.
+
+    image may be a crop of the frame whose top-left corner sits at origin.
+    With no target, no cells are shaded.
+    """
+    grid_color = (0, 200, 0)
+    thickness = 2
+
+    if occupancy is None:
+        occupancy = cell_occupancy(image, grid_size)
+    rows, cols = occupancy.shape
+    if target is None:
+        target = np.zeros((rows, cols), dtype=bool)
+    origin_x, origin_y = origin
 
-            # Check neighbors: if any side borders a non-white region, draw that side
-            # Top
-            if row == 0 or not np.any(white_mask[(row - 1) * grid_size:row * grid_size, x:x + grid_size]):
+    # Create a transparent overlay image for half transparency
+    overlay = image.copy()
+
+    for row, col in np.argwhere(target):
+        x = col * grid_size - origin_x
+        y = row * grid_size - origin_y
+        cv2.rectangle(overlay, (x, y), (x + grid_size, y + grid_size), (80, 80, 0), thickness=-1)
+
+    # An occupied cell gets an outline on every side that borders an empty cell or the screen edge
+    empty = np.pad(~occupancy, 1, constant_values=True)
+    edges = {
+        "top": occupancy & empty[:-2, 1:-1],
+        "bottom": occupancy & empty[2:, 1:-1],
+        "left": occupancy & empty[1:-1, :-2],
+        "right": occupancy & empty[1:-1, 2:]
+    }
+    for side, cells in edges.items():
+        for row, col in np.argwhere(cells):
+            x = col * grid_size - origin_x
+            y = row * grid_size - origin_y
+            if side == "top":
                 cv2.line(image, (x, y), (x + grid_size, y), grid_color, thickness)
-            # Bottom
-            if row == rows - 1 or not np.any(white_mask[(row + 1) * grid_size:(row + 2) * grid_size, x:x + grid_size]):
+            elif side == "bottom":
                 cv2.line(image, (x, y + grid_size), (x + grid_size, y + grid_size), grid_color, thickness)
-            # Left
-            if col == 0 or not np.any(white_mask[y:y + grid_size, (col - 1) * grid_size:col * grid_size]):
+            elif side == "left":
                 cv2.line(image, (x, y), (x, y + grid_size), grid_color, thickness)
-            # Right
-            if col == cols - 1 or not np.any(white_mask[y:y + grid_size, (col + 1) * grid_size:(col + 2) * grid_size]):
+            else:
                 cv2.line(image, (x + grid_size, y), (x + grid_size, y + grid_size), grid_color, thickness)
 
     # Apply half transparency by blending the overlay with the original image
@@ -308,7 +866,7 @@ def gridcheck(image):
 
 
 # Flask routes for API endpoints
-@app.route('/')
+@routes.route('/')
 def index():
     # Add CORS headers to this response explicitly
     response = jsonify({"status": "success", "message": "Pose Detection Server is running"})
@@ -318,7 +876,7 @@ def index():
     return response
 
 
-@app.route('/status')
+@routes.route('/status')
 def status():
     # Another endpoint for status checks
     response = jsonify({"status": "success", "message": "Server is active"})
@@ -328,135 +886,1787 @@ def status():
     return response
 
 
-def generate_frames():
-    global frame_counter, test_array
-    score_print_interval = 30  # Print score every 30 frames (about once per second at 30fps)
-    pose_change_interval = 30 * 30  # Change pose every 30 seconds (assuming 30fps)
-    
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            print("Can't receive frame.")
-            continue
+@routes.route('/ready')
+def ready():
+    """
+    Readiness probe: 200 once the camera pipeline has published a frame, 503 while it's
+    still warming up or if the last attempt failed. Probing starts (or retries) the warm-up.
+    """
+    warm_up()
+    pipeline = _pipeline
+    is_ready = pipeline is not None and pipeline.latest(timeout=0) is not None
+    if is_ready:
+        state = "running"
+    elif pipeline is None and _startup_error:
+        state = "failed"  # still retried on every probe
+    else:
+        state = "starting"
+    response = jsonify({"ready": is_ready, "pipeline": state, "poses": len(pose_library.ids()),
+                        "error": None if is_ready else _startup_error})
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    return response, 200 if is_ready else 503
 
-        frame = cv2.resize(frame, (WIDTH, HEIGHT))
-        
-        img_tensor = tf.convert_to_tensor(frame)
-        input_image = tf.image.resize_with_pad(img_tensor, input_size, input_size)
-        input_image = tf.expand_dims(input_image, axis=0)
 
-        keypoints = movenet(input_image)
+class FrameCompositor:
+    """
+    Composites output frames into preallocated buffers.
 
-        poly_layer = np.zeros_like(frame)
-        poly_layer = poly(poly_layer, keypoints)
+    The pixel grid and the target-pose overlay only change with the pose, so they
+    are rendered once into a cached background. Each frame only the region around
+    the body, its cell outlines and the skeleton is recomposited, the dots are
+    added on top, and whatever was drawn over the background the frame before is
+    restored from it. The output is the same as blending full-frame layers.
+    """
 
-        # Calculate score
-        score_data = get_score(poly_layer)
-        
-        grid_layer = gridcheck(poly_layer)
-        pixel_grid_layer = draw_pixel_frames(np.zeros_like(frame))
+    GLOW_REACH = 25 + 3  # GaussianBlur radius plus half the widest glow stroke, at 1080p
+
+    def __init__(self, frame_shape, bloom_downsample=1):
+        self.height, self.width = frame_shape[:2]
+        self.scale = self.height / HEIGHT
+        self.grid_size = self.height // (HEIGHT // GRID_SIZE)
+        self.blur_size = int(51 * self.scale) | 1
+        self.bloom_downsample = bloom_downsample
+        self.poly_layer = np.zeros(frame_shape, dtype=np.uint8)
+        self.glow_layer = np.zeros(frame_shape, dtype=np.uint8)  # scratch for poly(), blank between frames
+        # Flat scratch for add_glow(), cut to each frame's body region by _scratch()
+        self._glow_small = (np.empty(self.poly_layer.size // bloom_downsample ** 2 + 3, dtype=np.uint8)
+                            if bloom_downsample > 1 else None)
+        self._glow_blurred = np.empty(self.poly_layer.size, dtype=np.uint8)
+        self.skeleton_layer = np.zeros(frame_shape, dtype=np.uint8)
+        self.pixel_grid = draw_pixel_frames(np.zeros(frame_shape, dtype=np.uint8), self.grid_size)
+        self.background = None  # flipped static layers for the current target
+        self.frame = np.zeros(frame_shape, dtype=np.uint8)  # flipped output, kept between frames
+        self._target_key = None
+        self._poly_rect = None  # part of poly_layer that may not be blank
+        self._dirty = []  # rects drawn over the background last frame
+        self._dot_mask = None  # pixels the dots drew on last frame
+
+    def _clip(self, rect):
+        if rect is None:
+            return None
+        y0, y1, x0, x1 = rect
+        y0, y1 = max(int(y0), 0), min(int(y1), self.height)
+        x0, x1 = max(int(x0), 0), min(int(x1), self.width)
+        return (y0, y1, x0, x1) if y0 < y1 and x0 < x1 else None
+
+    @staticmethod
+    def _union(rects):
+        rects = [rect for rect in rects if rect is not None]
+        if not rects:
+            return None
+        return (min(r[0] for r in rects), max(r[1] for r in rects),
+                min(r[2] for r in rects), max(r[3] for r in rects))
+
+    @staticmethod
+    def _scratch(buffer, height, width):
+        # Contiguous view from the front of a flat buffer, so OpenCV writes into it in place
+        return buffer[:height * width * 3].reshape(height, width, 3)
+
+    def _mirror(self, image, rect):
+        y0, y1, x0, x1 = rect
+        return image[y0:y1, self.width - x1:self.width - x0]
+
+    def _update_background(self, target):
+        key = target.tobytes()
+        if key == self._target_key:
+            return
+        blank = np.zeros_like(self.poly_layer)
+        empty_grid = gridcheck(blank, np.zeros_like(target), target, grid_size=self.grid_size)
+        background = cv2.add(empty_grid, empty_grid)
+        cv2.add(background, self.pixel_grid, dst=background)
+        self.background = cv2.flip(background, 1)
+        self.frame[:] = self.background
+        self._target_key = key
+        self._dirty = []
+        self._dot_mask = None
+
+    def render_body(self, keypoints, shapes):
+        """Render poly() into the shared poly layer, only touching the region around the body."""
+        if self._poly_rect is not None:
+            y0, y1, x0, x1 = self._poly_rect
+            self.poly_layer[y0:y1, x0:x1] = 0
+
+        reach = int(self.GLOW_REACH * self.scale) + self.bloom_downsample
+        bounds = [_shape_bounds(kind, geometry, max(thickness, glow_thickness))
+                  for kind, geometry, thickness, glow_thickness in shapes]
+        rect = self._clip(self._union([(y_min - reach, y_max + reach + 1, x_min - reach, x_max + reach + 1)
+                                       for x_min, y_min, x_max, y_max in bounds]))
+        self._poly_rect = rect
+        if rect is not None:
+            y0, y1, x0, x1 = rect
+            view = self.poly_layer[y0:y1, x0:x1]
+            glow_view = self.glow_layer[y0:y1, x0:x1]
+            down = self.bloom_downsample
+            small = (self._scratch(self._glow_small, max((y1 - y0) // down, 1), max((x1 - x0) // down, 1))
+                     if down > 1 else None)
+            blurred = self._scratch(self._glow_blurred, y1 - y0, x1 - x0)
+            poly(view, keypoints, shapes=shapes, offset=(-x0, -y0), blur_size=self.blur_size,
+                 downsample=down, glow_layer=glow_view, small=small, blurred=blurred)
+            glow_view[:] = 0
+        return self.poly_layer
+
+    def compose(self, keypoints, occupancy, target, dots=None):
+        """Build the flipped output frame. The returned buffer is reused by the next call."""
+        self._update_background(target)
+        for rect in self._dirty:
+            self._mirror(self.frame, rect)[:] = self._mirror(self.background, rect)
+        self._dirty = []
+        if self._dot_mask is not None:
+            cv2.copyTo(self.background, self._dot_mask, self.frame)
+
+        # Cell outlines reach 2px past the occupied cells, skeleton dots 4px past the keypoints
+        cells_rect = None
+        if occupancy.any():
+            occupied_rows = np.flatnonzero(occupancy.any(axis=1))
+            occupied_cols = np.flatnonzero(occupancy.any(axis=0))
+            grid_size = self.grid_size
+            cells_rect = (occupied_rows[0] * grid_size - 2, (occupied_rows[-1] + 1) * grid_size + 3,
+                          occupied_cols[0] * grid_size - 2, (occupied_cols[-1] + 1) * grid_size + 3)
+        skeleton_rect = None
+        visible = keypoints[0, 0][keypoints[0, 0, :, 2] > 0.3]
+        if len(visible):
+            xs = (visible[:, 1] * self.width).astype(int)
+            ys = (visible[:, 0] * self.height).astype(int)
+            skeleton_rect = (ys.min() - 5, ys.max() + 6, xs.min() - 5, xs.max() + 6)
+
+        rect = self._clip(self._union([self._poly_rect, cells_rect, skeleton_rect]))
+        if rect is not None:
+            y0, y1, x0, x1 = rect
+            grid_view = gridcheck(self.poly_layer[y0:y1, x0:x1], occupancy, target, origin=(x0, y0),
+                                  grid_size=self.grid_size)
+            composite = cv2.add(grid_view, grid_view)
+            cv2.add(composite, self.pixel_grid[y0:y1, x0:x1], dst=composite)
+
+            draw_prediction_on_image(self.skeleton_layer, keypoints)
+            skeleton_view = self.skeleton_layer[y0:y1, x0:x1]
+            cv2.add(composite, skeleton_view, dst=composite)
+            skeleton_view[:] = 0
+
+            self._mirror(self.frame, rect)[:] = composite[:, ::-1]
+            self._poly_rect = rect  # gridcheck drew into the poly layer
+            self._dirty.append(rect)
+
+        self._dot_mask = draw_scrolling_dots(self.frame, dots, mirror=True, scale=self.scale)
+        return self.frame
+
+
+def render_frame(compositor, keypoints, game, record=None):
+    """
+    Build the composited output frame for one set of keypoints, scored against game's target pose.
 
-        skeleton_layer = draw_prediction_on_image(np.zeros_like(frame), keypoints)
+    record, if given, is called as record(stage, start) after the poly, score and
+    compose steps, with start the perf_counter() the step began at.
 
-        dots_layer = draw_scrolling_dots(np.zeros_like(frame))
+    Returns:
+        tuple: (final_overlay, score_data); final_overlay is the compositor's reused buffer
+    """
+    start = time.perf_counter()
+    shapes = body_shapes(keypoints, width=compositor.width, height=compositor.height)
+    poly_layer = compositor.render_body(keypoints, shapes)
+    if record:
+        record("poly", start)
+        start = time.perf_counter()
+
+    # Calculate score; the occupancy grid is shared with gridcheck so it's only computed once.
+    # Geometry scoring always runs at the full 1920x1080 so scores don't depend on the profile.
+    if SCORING_MODE == "geometry":
+        occupancy = shape_occupancy(shapes if compositor.scale == 1 else body_shapes(keypoints))
+    else:
+        occupancy = cell_occupancy(poly_layer, compositor.grid_size)
+    score_data = get_score(poly_layer, game.pose_array, occupancy)
+    if record:
+        record("score", start)
+        start = time.perf_counter()
+
+    target = target_grid(game.pose_array, *occupancy.shape)
+    final_overlay = compositor.compose(keypoints, occupancy, target, game.dots)
+    if record:
+        record("compose", start)
+    return final_overlay, score_data
+
+
+# --- Frame pipeline ---
+# Capture, inference and render/encode each run on their own thread, linked by
+# bounded queues that only ever hold the newest item. The renderer runs at a
+# fixed output rate and reuses the last keypoints when inference falls behind.
+# There is exactly one pipeline per process: it owns the webcam and the pose
+# model, and every endpoint reads the state it publishes instead of touching
+# the camera itself.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.02, 0.033, 0.05, 0.075, 0.1, 0.2, 0.5, 1.0)
+JPEG_SIZE_BUCKETS = (10_000, 25_000, 50_000, 100_000, 200_000, 400_000, 800_000)
+
+
+class Histogram:
+    """Fixed-bucket histogram, aggregated as values come in so recording is just a couple of adds."""
+
+    def __init__(self, buckets):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, value):
+        with self._lock:
+            self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.total += value
+
+    def prometheus(self, name, labels=""):
+        """Prometheus text exposition lines for this histogram."""
+        with self._lock:
+            counts, count, total = list(self.bucket_counts), self.count, self.total
+        sep = "," if labels else ""
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+            cumulative += bucket_count
+            lines.append(f'{name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {total}")
+        lines.append(f"{name}_count{suffix} {count}")
+        return lines
+
+
+class StageTimer(Histogram):
+    """Running latency counters for one pipeline stage."""
+
+    def __init__(self):
+        super().__init__(LATENCY_BUCKETS)
+        self.last = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        with self._lock:
+            self.bucket_counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.count += 1
+            self.total += seconds
+            self.last = seconds
+            self.max = max(self.max, seconds)
+
+    def snapshot(self):
+        with self._lock:
+            avg = self.total / self.count if self.count else 0.0
+            return {
+                "count": self.count,
+                "avg_ms": round(avg * 1000, 2),
+                "last_ms": round(self.last * 1000, 2),
+                "max_ms": round(self.max * 1000, 2)
+            }
+
+
+class InferenceThrottle:
+    """
+    Decide how often to run pose estimation so inference can't starve the renderer.
+
+    Inference gets at most `duty` of the wall clock: with a smoothed latency of L
+    it runs every `factor` output frames, the smallest factor with L <= duty *
+    factor * frame_interval. Just fitting L into the frames between runs isn't
+    enough, that keeps the inference thread busy all the time and leaves the
+    renderer nothing. The duty shrinks while the renderer overruns its frame
+    budget and grows back once it has headroom. The factor steps back down on
+    its own when the latency recovers.
+    """
 
-        # Combine all layers
-        final_overlay = cv2.addWeighted(grid_layer, 1.0, poly_layer, 1.0, 0)
-        final_overlay = cv2.addWeighted(final_overlay, 1.0, pixel_grid_layer, 1.0, 0)
-        final_overlay = cv2.addWeighted(final_overlay, 1.0, skeleton_layer, 1.0, 0)
-        final_overlay = cv2.addWeighted(final_overlay, 1.0, dots_layer, 1.0, 0)
-        
-        # Print score to stdout at specified interval to avoid flooding
-        if frame_counter % score_print_interval == 0:
-            print(f"Score: {score_data['score']} / {score_data['max_possible']} | Boxes: {score_data['boxes_lit']} / {score_data['total_boxes']}")
-            
-            # Only check for pose change when already printing score to reduce frequency
-            if frame_counter > 0 and frame_counter % pose_change_interval == 0:
+    def __init__(self, frame_interval, max_factor=15, duty=0.5, min_duty=0.2, smoothing=0.2, adjust_every=1.0):
+        self.frame_interval = frame_interval
+        self.max_factor = max_factor
+        self.max_duty = duty
+        self.min_duty = min_duty
+        self.duty = duty
+        self.smoothing = smoothing
+        self.adjust_every = adjust_every  # seconds between duty changes, so a change can take effect first
+        self.latency = 0.0
+        self.render_latency = 0.0
+        self.factor = 1
+        self.skipped = 0
+        self._next_run = 0.0
+        self._duty_changed = None
+
+    def should_run(self, now):
+        if now >= self._next_run:
+            # Half a frame of slack so camera jitter doesn't make us skip frames at factor 1
+            self._next_run = now + (self.factor - 0.5) * self.frame_interval
+            return True
+        self.skipped += 1
+        return False
+
+    def _needed(self, latency):
+        needed = math.ceil(latency / (self.duty * self.frame_interval))
+        return min(max(needed, 1), self.max_factor)
+
+    def record(self, seconds):
+        """Feed one inference latency and re-size the factor. Only the inference thread calls this."""
+        self.latency += self.smoothing * (seconds - self.latency)
+        needed = self._needed(self.latency)
+        if needed > self.factor:
+            self.factor = needed
+        elif needed < self.factor and self._needed(self.latency / 0.8) < self.factor:
+            # Only step down once there's some headroom, otherwise it flaps between two factors
+            self.factor -= 1
+
+    def record_render(self, now, seconds):
+        """Feed how long the renderer worked on one frame; inference gets less time while it overruns."""
+        self.render_latency += self.smoothing * (seconds - self.render_latency)
+        if self._duty_changed is not None and now - self._duty_changed < self.adjust_every:
+            return
+        if self.render_latency > self.frame_interval and self.duty > self.min_duty:
+            self.duty = max(self.duty * 0.75, self.min_duty)
+            self._duty_changed = now
+        elif self.render_latency < 0.7 * self.frame_interval and self.duty < self.max_duty:
+            self.duty = min(self.duty / 0.75, self.max_duty)
+            self._duty_changed = now
+
+    def snapshot(self):
+        return {
+            "decimation": self.factor,
+            "inference_duty": round(self.duty, 3),
+            "smoothed_latency_ms": round(self.latency * 1000, 2),
+            "smoothed_render_ms": round(self.render_latency * 1000, 2),
+            "skipped": self.skipped
+        }
+
+
+class KeypointExtrapolator:
+    """
+    Fill in keypoints between inference results with a constant-velocity guess.
+
+    Velocity comes from the last two results (smoothed), and is only applied to
+    points that were visible in both. Predictions never run further than
+    max_horizon seconds past the newest result, after that the points just hold.
+    """
+
+    def __init__(self, threshold=0.3, smoothing=0.5):
+        self.threshold = threshold
+        self.smoothing = smoothing
+        self.keypoints = np.zeros((1, 1, 33, 3))
+        self.velocity = np.zeros((33, 2))
+        self._stamp = None
+        self._received = 0.0
+
+    def update(self, stamp, keypoints, received):
+        """Add an inference result for a frame captured at `stamp`, handed over at `received`."""
+        if self._stamp is not None and stamp > self._stamp:
+            visible = ((keypoints[0, 0, :, 2] > self.threshold) &
+                       (self.keypoints[0, 0, :, 2] > self.threshold))
+            velocity = (keypoints[0, 0, :, :2] - self.keypoints[0, 0, :, :2]) / (stamp - self._stamp)
+            velocity[~visible] = 0.0
+            self.velocity += self.smoothing * (velocity - self.velocity)
+            self.velocity[~visible] = 0.0
+        else:
+            self.velocity[:] = 0.0
+        self.keypoints = keypoints
+        self._stamp = stamp
+        self._received = received
+
+    def predict(self, now, max_horizon):
+        dt = min(max(now - self._received, 0.0), max_horizon)
+        if dt == 0.0 or not self.velocity.any():
+            return self.keypoints
+        predicted = self.keypoints.copy()
+        predicted[0, 0, :, :2] += self.velocity * dt
+        return predicted
+
+
+class OneEuroFilter:
+    """
+    One-Euro filter (Casiez et al. 2012) over an array of coordinates.
+
+    The cutoff frequency rises with speed: a still body gets heavy smoothing
+    (no jitter from frame to frame), a fast arm gets very little (no lag).
+    min_cutoff is in Hz, beta is how much each normalized unit/second of speed
+    raises it.
+    """
+
+    def __init__(self, min_cutoff=1.5, beta=5.0, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.value = None
+        self.speed = None
+        self._stamp = None
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def __call__(self, stamp, value, reset=None):
+        """Filter `value` sampled at `stamp`. Entries flagged in `reset` jump straight to the new value."""
+        if self.value is None or stamp <= self._stamp:
+            self.value = value.copy()
+            self.speed = np.zeros_like(value)
+            self._stamp = stamp
+            return self.value.copy()
+
+        dt = stamp - self._stamp
+        self._stamp = stamp
+        speed = (value - self.value) / dt
+        self.speed += self._alpha(self.d_cutoff, dt) * (speed - self.speed)
+        cutoff = self.min_cutoff + self.beta * np.abs(self.speed)
+        self.value += self._alpha(cutoff, dt) * (value - self.value)
+        if reset is not None:
+            self.value[reset] = value[reset]
+            self.speed[reset] = 0.0
+        return self.value.copy()
+
+
+class KeypointTracker:
+    """
+    Smooth raw inference results before anything draws or scores them.
+
+    Positions go through a One-Euro filter on the capture timestamps.
+    Visibility has hysteresis: a point shows up once it's seen above show,
+    and only goes away once it drops below hide, so a wrist hovering around
+    the 0.3 threshold doesn't blink in and out of the outline. The output
+    keeps the movenet() layout; tracked points get a visibility of at least
+    show, dropped points get 0.
+    """
+
+    def __init__(self, show=0.5, hide=0.2, **filter_args):
+        self.show = show
+        self.hide = hide
+        self.filter = OneEuroFilter(**filter_args)
+        self.visible = np.zeros(33, dtype=bool)
+
+    def update(self, stamp, keypoints):
+        points = keypoints[0, 0]
+        visibility = points[:, 2]
+        appeared = ~self.visible & (visibility > self.show)
+        self.visible = (self.visible & (visibility >= self.hide)) | appeared
+
+        tracked = np.zeros((1, 1, 33, 3))
+        # Points that just came back (or aren't tracked) start fresh instead of sliding in from where they were lost
+        tracked[0, 0, :, :2] = self.filter(stamp, points[:, :2].astype(np.float64), appeared | ~self.visible)
+        tracked[0, 0, :, 2] = np.where(self.visible, np.maximum(visibility, self.show), 0.0)
+        return tracked
+
+
+class PostureState:
+    """
+    Rolling aggregates over the tracked keypoints and scores, for consumers
+    that want a settled answer instead of the latest frame.
+
+    - shrimp: detect_shrimp() has to hold for shrimp_on seconds to switch on
+      and be gone for shrimp_off seconds to switch off
+    - in pose: score at or above in_pose_ratio of the max for the current
+      pose; tracks the current streak and the best one for this pose
+    - person: any point tracked
+
+    update() is called once per rendered frame; snapshot() is cheap and safe
+    from any thread.
+    """
+
+    def __init__(self, shrimp_on=0.5, shrimp_off=0.5, in_pose_ratio=0.8):
+        self.shrimp_on = shrimp_on
+        self.shrimp_off = shrimp_off
+        self.in_pose_ratio = in_pose_ratio
+        self._lock = threading.Lock()
+        self._last = None
+        self.person = False
+        self.shrimp = False
+        self.shrimp_since = None
+        self.shrimp_total = 0.0
+        self._shrimp_flip = None
+        self.pose_id = None
+        self.in_pose = False
+        self.in_pose_since = None
+        self.best_in_pose = 0.0
+
+    def update(self, now, keypoints, score_data, pose_id):
+        with self._lock:
+            dt = now - self._last if self._last is not None else 0.0
+            self._last = now
+            self.person = bool((keypoints[0, 0, :, 2] > 0.3).any())
+
+            if self.shrimp:
+                self.shrimp_total += dt
+            if detect_shrimp(keypoints) != self.shrimp:
+                if self._shrimp_flip is None:
+                    self._shrimp_flip = now
+                elif now - self._shrimp_flip >= (self.shrimp_off if self.shrimp else self.shrimp_on):
+                    # Count the time from when the posture actually changed, not from when we believed it
+                    self.shrimp_total += (now - self._shrimp_flip) * (1 if not self.shrimp else -1)
+                    self.shrimp = not self.shrimp
+                    self.shrimp_since = self._shrimp_flip if self.shrimp else None
+                    self._shrimp_flip = None
+            else:
+                self._shrimp_flip = None
+
+            if pose_id != self.pose_id:
+                self.pose_id = pose_id
+                self.in_pose = False
+                self.in_pose_since = None
+                self.best_in_pose = 0.0
+            max_possible = score_data["max_possible"]
+            in_pose = max_possible > 0 and score_data["score"] >= self.in_pose_ratio * max_possible
+            if in_pose and not self.in_pose:
+                self.in_pose_since = now
+            elif not in_pose:
+                self.in_pose_since = None
+            self.in_pose = in_pose
+            if in_pose:
+                self.best_in_pose = max(self.best_in_pose, now - self.in_pose_since)
+
+    def snapshot(self, now=None):
+        """Current derived state, durations in seconds."""
+        with self._lock:
+            now = self._last if now is None else now
+            return {
+                "person": self.person,
+                "isShrimp": self.shrimp,
+                "shrimp_seconds": round(now - self.shrimp_since, 3) if self.shrimp else 0.0,
+                "shrimp_total_seconds": round(self.shrimp_total, 3),
+                "pose_id": self.pose_id,
+                "in_pose": self.in_pose,
+                "time_in_pose": round(now - self.in_pose_since, 3) if self.in_pose else 0.0,
+                "best_time_in_pose": round(self.best_in_pose, 3)
+            }
+
+
+class FrameTracer:
+    """
+    Optional per-frame trace spans, kept in a ring buffer of the most recent ones.
+
+    Off unless POSE_TRACE is set (or it's switched on through /trace); when off,
+    span() is a single attribute check. export() gives Chrome trace-event JSON
+    that loads in chrome://tracing or Perfetto.
+    """
+
+    def __init__(self, enabled=False, max_spans=5000):
+        self.enabled = enabled
+        self.spans = deque(maxlen=max_spans)
+        self._origin = time.perf_counter()
+
+    def span(self, name, start, end, frame=None):
+        if self.enabled:
+            self.spans.append((name, threading.current_thread().name, start, end, frame))
+
+    def export(self):
+        events = []
+        for name, thread, start, end, frame in list(self.spans):
+            events.append({
+                "name": name,
+                "ph": "X",
+                "pid": 0,
+                "tid": thread,
+                "ts": round((start - self._origin) * 1e6, 1),
+                "dur": round((end - start) * 1e6, 1),
+                "args": {"frame": frame} if frame is not None else {}
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+# Keypoint recordings: a 16-byte header (magic, version, keypoint float bits, record
+# size) followed by fixed-size records, one per rendered frame. Fixed records mean
+# a whole file memory-maps straight into a numpy array, and a crash mid-write only
+# ever loses the partial record at the end. 440 bytes a frame with float32
+# keypoints (~48MB per hour at 30fps), 242 with float16 (~26MB) - but float16
+# moves points by up to a pixel, enough to flip a few percent of re-scored frames.
+RECORDING_MAGIC = b"PXKP"
+RECORDING_VERSION = 2
+RECORDING_HEADER = struct.Struct("<4sHHI4x")  # magic, version, keypoint float bits, record size
+# Bytes for the pose id by version: version 1 only had room for short ids, version 2
+# fits a 24-character Mongo ObjectId. Older versions are still read.
+RECORDING_POSE_ID_BYTES = {1: 8, 2: 24}
+
+
+def recording_dtype(bits=32, version=RECORDING_VERSION):
+    """numpy dtype of one recording record, with float16 or float32 keypoints."""
+    return np.dtype([
+        ("time", "<f8"),            # unix time the frame was rendered
+        ("frame", "<u4"),           # pipeline frame number
+        ("pose_id", f"S{RECORDING_POSE_ID_BYTES[version]}"),  # empty if no pose, or its id didn't fit
+        ("score", "<i2"),
+        ("max_possible", "<i2"),
+        ("boxes_lit", "u1"),
+        ("total_boxes", "u1"),
+        ("incorrect_boxes", "u1"),
+        ("shrimp", "u1"),
+        ("keypoints", f"<f{bits // 8}", (33, 3)),  # movenet() layout, [y, x, visibility]
+    ])
+
+
+class KeypointRecorder:
+    """
+    Appends rendered frames (keypoints, target pose id, score, shrimp flag) to a recording.
+
+    Frames are collected into a chunk of chunk_frames records and written with one
+    write() when it fills (or on flush()/close()), so the render loop never waits on
+    the disk for more than one write per chunk. Appending to an existing recording
+    continues it, as long as it uses the same keypoint precision and format version.
+    A pose id too long for the record is stored as no pose (with a warning), never cut short.
+    """
+
+    def __init__(self, path, bits=32, chunk_frames=300):
+        self.path = path
+        self.dtype = recording_dtype(bits)
+        self.frames = 0
+        self._chunk = np.zeros(chunk_frames, dtype=self.dtype)
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._pose_ids = {}  # pose id -> encoded record value
+
+        self._file = open(path, "ab+")
+        self._file.seek(0, os.SEEK_END)
+        size = self._file.tell()
+        if size == 0:
+            self._file.write(RECORDING_HEADER.pack(RECORDING_MAGIC, RECORDING_VERSION, bits, self.dtype.itemsize))
+        else:
+            self._file.seek(0)
+            magic, version, file_bits, record_size = RECORDING_HEADER.unpack(self._file.read(RECORDING_HEADER.size))
+            if magic != RECORDING_MAGIC or version != RECORDING_VERSION or file_bits != bits:
+                self._file.close()
+                raise ValueError(f"{path} is not a version {RECORDING_VERSION} float{bits} keypoint recording")
+            # Drop a record left half-written by a crash so the ones we add line up
+            self.frames = (size - RECORDING_HEADER.size) // record_size
+            self._file.truncate(RECORDING_HEADER.size + self.frames * record_size)
+            self._file.seek(0, os.SEEK_END)
+
+    def append(self, stamp, frame, keypoints, score_data, pose_id, shrimp):
+        with self._lock:
+            if self._file is None:
+                return  # closed while the render loop still had us
+            record = self._chunk[self._pending]
+            record["time"] = stamp
+            record["frame"] = frame
+            record["pose_id"] = self._encode_pose_id(pose_id)
+            record["score"] = score_data["score"]
+            record["max_possible"] = score_data["max_possible"]
+            record["boxes_lit"] = score_data["boxes_lit"]
+            record["total_boxes"] = score_data["total_boxes"]
+            record["incorrect_boxes"] = score_data["incorrect_boxes"]
+            record["shrimp"] = shrimp
+            record["keypoints"] = keypoints[0, 0]
+            self._pending += 1
+            self.frames += 1
+            if self._pending == len(self._chunk):
+                self._write()
+
+    def _encode_pose_id(self, pose_id):
+        encoded = self._pose_ids.get(pose_id)
+        if encoded is None:
+            encoded = (pose_id or "").encode()
+            if len(encoded) > self.dtype["pose_id"].itemsize:
+                # A truncated id could name a different pose, so record that we don't know it
+                print(f"Recording pose {pose_id!r} without its id: longer than {self.dtype['pose_id'].itemsize} bytes")
+                encoded = b""
+            self._pose_ids[pose_id] = encoded
+        return encoded
+
+    def _write(self):
+        self._file.write(self._chunk[:self._pending].tobytes())
+        self._file.flush()
+        self._pending = 0
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None and self._pending:
+                self._write()
+
+    def close(self):
+        with self._lock:
+            if self._file is None:
+                return
+            if self._pending:
+                self._write()
+            self._file.close()
+            self._file = None
+
+    def snapshot(self):
+        return {"path": self.path, "frames": self.frames, "bytes": RECORDING_HEADER.size + self.frames * self.dtype.itemsize}
+
+
+class KeypointRecording:
+    """
+    A recording opened for reading, memory-mapped: `records` is a numpy structured
+    array (see recording_dtype()) that only pages in what gets touched.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            header = f.read(RECORDING_HEADER.size)
+        if len(header) < RECORDING_HEADER.size:
+            raise ValueError(f"{path} is not a keypoint recording")
+        magic, version, bits, record_size = RECORDING_HEADER.unpack(header)
+        if magic != RECORDING_MAGIC or version not in RECORDING_POSE_ID_BYTES or bits not in (16, 32):
+            raise ValueError(f"{path} is not a keypoint recording")
+        self.version = version
+        self.dtype = recording_dtype(bits, version)
+        if self.dtype.itemsize != record_size:
+            raise ValueError(f"{path} has {record_size}-byte records, expected {self.dtype.itemsize}")
+
+        frames = (os.path.getsize(path) - RECORDING_HEADER.size) // record_size
+        if frames:
+            self.records = np.memmap(path, dtype=self.dtype, mode="r", offset=RECORDING_HEADER.size, shape=(frames,))
+        else:
+            self.records = np.zeros(0, dtype=self.dtype)  # mmap can't map zero bytes
+
+    def __len__(self):
+        return len(self.records)
+
+    def keypoints(self, index):
+        """Frame `index` as a movenet()-shaped (1, 1, 33, 3) float64 array."""
+        return self.records["keypoints"][index].astype(np.float64)[None, None]
+
+    def score(self, index):
+        """The score recorded with frame `index`, shaped like score_occupancy() output."""
+        record = self.records[index]
+        return {key: int(record[key]) for key in ("score", "max_possible", "boxes_lit", "total_boxes", "incorrect_boxes")}
+
+
+class GameEvents:
+    """
+    Turn the per-frame game state into change events for /events streams.
+
+    update() runs once per rendered frame and only appends an event when
+    something changed: "score" (score or boxes changed), "pose" (new target
+    pose) and "shrimp" (the settled PostureState flag flipped, so one noisy
+    detection doesn't make the client flicker). Events get increasing ids
+    and the most recent max_events are kept for clients to catch up from.
+    """
+
+    def __init__(self, max_events=256):
+        self.events = deque(maxlen=max_events)  # (id, type, data)
+        self.last_id = 0
+        self._score = None
+        self._pose_id = None
+        self._shrimp = False
+
+    def _emit(self, kind, data):
+        self.last_id += 1
+        self.events.append((self.last_id, kind, data))
+
+    def update(self, frame, score_data, posture, pose_id):
+        """Compare this frame against the last emitted state. Returns True if any event was added."""
+        last_id = self.last_id
+        if pose_id != self._pose_id:
+            self._pose_id = pose_id
+            self._emit("pose", {"pose_id": pose_id, "frame": frame})
+
+        score = (score_data["score"], score_data["boxes_lit"], score_data["incorrect_boxes"], score_data["total_boxes"])
+        if score != self._score:
+            delta = score_data["score"] - (self._score[0] if self._score else 0)
+            self._score = score
+            self._emit("score", {**score_data, "delta": delta, "frame": frame})
+
+        if posture["isShrimp"] != self._shrimp:
+            self._shrimp = posture["isShrimp"]
+            self._emit("shrimp", {"isShrimp": self._shrimp, "shrimp_total_seconds": posture["shrimp_total_seconds"],
+                                  "frame": frame})
+        return self.last_id != last_id
+
+    def covers(self, last_id):
+        """
+        True if a client that has seen up to last_id can catch up from the kept events. Not
+        for ids from before a server restart (ahead of ours) or that fell out of the buffer.
+        """
+        if last_id > self.last_id:
+            return False
+        return not self.events or last_id >= self.events[0][0] - 1
+
+    def since(self, last_id):
+        """Events after last_id, oldest first."""
+        return [event for event in self.events if event[0] > last_id]
+
+
+def put_latest(q, item):
+    """Put item on a bounded queue, dropping the oldest entries if it's full. Returns the number dropped."""
+    dropped = 0
+    while True:
+        try:
+            q.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                q.get_nowait()
+                dropped += 1
+            except queue.Empty:
+                pass
+
+
+class FramePipeline:
+    STAGES = ("capture", "inference", "render", "encode")
+    RENDER_STAGES = ("poly", "score", "compose")
+
+    def __init__(self, capture, pose, target_fps=30, profile=DEFAULT_PROFILE, verbose=True):
+        self.capture = capture
+        self.pose = pose
+        self.pose_complexity = QUALITY_PROFILES[profile]["model_complexity"]
+        self.profile = profile
+        self.target_fps = target_fps
+        self.frames = queue.Queue(maxsize=1)     # capture -> inference
+        self.keypoints = queue.Queue(maxsize=1)  # inference -> render
+        self.stats = {stage: StageTimer() for stage in self.STAGES + self.RENDER_STAGES}
+        self.jpeg_bytes = Histogram(JPEG_SIZE_BUCKETS)
+        self.inferences = 0
+        self.missing_keypoints = 0
+        self.clients = {}  # /video_feed client id -> {"addr", "since", "frames", "fps"}
+        self.tracer = FrameTracer(enabled=bool(os.environ.get("POSE_TRACE")))
+        self.throttle = InferenceThrottle(1.0 / target_fps)
+        self.compositor = self._make_compositor()
+        self.dropped = {"frames": 0, "keypoints": 0}
+
+        self._stop = threading.Event()
+        self._threads = []
+        self._output = threading.Condition()
+        self._jpeg = None
+        self._frame = None
+        self._variants = {}  # (quality, scale) -> (seq, jpeg bytes)
+        self._variants_lock = threading.Lock()
+        self._keypoints = None
+        self._score = None
+        self._posture = None
+        self._seq = 0
+        self.events = GameEvents()
+        self.game = GameState(verbose=verbose)
+        self.posture = PostureState()
+        self.recorder = None  # KeypointRecorder while /recording is on
+        self._client_ids = itertools.count(1)
+
+    def set_profile(self, name):
+        """Switch quality profile; the worker threads pick the change up on their next frame."""
+        if name not in QUALITY_PROFILES:
+            raise ValueError(f"Unknown profile '{name}', expected one of {sorted(QUALITY_PROFILES)}")
+        self.profile = name
+
+    def _timed(self, stage, start, frame=None):
+        """Record a stage that started at start (perf_counter) and just finished. Returns the elapsed time."""
+        end = time.perf_counter()
+        self.stats[stage].record(end - start)
+        self.tracer.span(stage, start, end, frame)
+        return end - start
+
+    def _make_compositor(self):
+        settings = QUALITY_PROFILES[self.profile]
+        return FrameCompositor((settings["height"], settings["width"], 3), settings["bloom_downsample"])
+
+    def start(self):
+        for target in (self._capture_loop, self._inference_loop, self._render_loop):
+            thread = threading.Thread(target=target, name=target.__name__.strip("_"), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+        if self.recorder is not None:
+            self.recorder.close()
+        self.capture.release()
+        self.pose.close()
+
+    def _capture_loop(self):
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            ret, frame = self.capture.read()
+            if not ret:
+                print("Can't receive frame.")
+                time.sleep(0.01)
+                continue
+            self._timed("capture", start)
+            self.dropped["frames"] += put_latest(self.frames, (start, frame))
+
+    def _inference_loop(self):
+        failed_complexity = None
+        while not self._stop.is_set():
+            try:
+                stamp, frame = self.frames.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if not self.throttle.should_run(time.perf_counter()):
+                continue  # shedding load, the renderer extrapolates over this frame
+
+            settings = QUALITY_PROFILES[self.profile]
+            wanted = settings["model_complexity"]
+            if wanted != self.pose_complexity and wanted != failed_complexity:
+                # Pose graphs aren't thread safe, so only this thread ever swaps the model
                 try:
-                    test_array = get_random_pose_array()
-                    print("Changed to new pose!")
+                    pose = make_pose(wanted)
                 except Exception as e:
-                    print(f"Error changing pose: {e}")
+                    print(f"Couldn't load pose model complexity {wanted}, keeping {self.pose_complexity}: {e}")
+                    failed_complexity = wanted
+                else:
+                    self.pose.close()
+                    self.pose, self.pose_complexity = pose, wanted
+                    failed_complexity = None
+
+            start = time.perf_counter()
+            keypoints = movenet(frame, self.pose, settings["inference_width"])
+            self.throttle.record(self._timed("inference", start))
+            self.inferences += 1
+            if not keypoints[0, 0, :, 2].any():
+                self.missing_keypoints += 1
+            self.dropped["keypoints"] += put_latest(self.keypoints, (stamp, keypoints))
+
+    def _render_loop(self):
+        frame_interval = 1.0 / self.target_fps
+        tracker = KeypointTracker()
+        extrapolator = KeypointExtrapolator()
+        deadline = time.perf_counter()
+
+        while not self._stop.is_set():
+            frame_start = time.perf_counter()
+            try:
+                stamp, keypoints = self.keypoints.get_nowait()
+                extrapolator.update(stamp, tracker.update(stamp, keypoints), time.perf_counter())
+            except queue.Empty:
+                pass  # no new pose yet, move the last one along
+            # Don't guess further ahead than the gap until the next inference result should land
+            horizon = (self.throttle.factor + 1) * frame_interval
+            keypoints = extrapolator.predict(time.perf_counter(), horizon)
+
+            settings = QUALITY_PROFILES[self.profile]
+            if ((self.compositor.height, self.compositor.width, self.compositor.bloom_downsample) !=
+                    (settings["height"], settings["width"], settings["bloom_downsample"])):
+                self.compositor = self._make_compositor()
+
+            frame_no = self._seq + 1
+            start = time.perf_counter()
+            final_overlay, score_data = render_frame(self.compositor, keypoints, self.game,
+                                                     record=lambda stage, t: self._timed(stage, t, frame_no))
+            self.game.advance(score_data)
+            self.posture.update(time.perf_counter(), keypoints, score_data, self.game.pose_id)
+            posture = self.posture.snapshot()
+            recorder = self.recorder
+            if recorder is not None:
+                recorder.append(time.time(), frame_no, keypoints, score_data, self.game.pose_id, posture["isShrimp"])
+            self._timed("render", start, frame_no)
+
+            start = time.perf_counter()
+            ret, jpeg = cv2.imencode('.jpg', final_overlay, [cv2.IMWRITE_JPEG_QUALITY, settings["jpeg_quality"]])
+            self._timed("encode", start, frame_no)
+            if ret:
+                self.jpeg_bytes.record(len(jpeg))
+                with self._output:
+                    self._jpeg = jpeg.tobytes()
+                    self._frame = final_overlay.copy()  # the compositor reuses its buffer
+                    self._keypoints = keypoints
+                    self._score = score_data
+                    self._posture = posture
+                    self._seq += 1
+                    self.events.update(self._seq, score_data, posture, self.game.pose_id)
+                    self._output.notify_all()
+
+            now = time.perf_counter()
+            self.throttle.record_render(now, now - frame_start)
+
+            # Hold a steady output rate; if we fell more than a frame behind, don't try to catch up
+            deadline += frame_interval
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -frame_interval:
+                deadline = time.perf_counter()
+
+    def wait_for_frame(self, last_seq, timeout=1.0):
+        """Block until a frame newer than last_seq is ready. Returns (seq, jpeg_bytes), jpeg_bytes is None on timeout."""
+        with self._output:
+            self._output.wait_for(lambda: self._seq != last_seq, timeout=timeout)
+            if self._seq == last_seq:
+                return last_seq, None
+            return self._seq, self._jpeg
+
+    def wait_for_raw(self, last_seq, timeout=1.0):
+        """Like wait_for_frame(), but returns the unencoded BGR frame. Treat it as read-only, it's shared."""
+        with self._output:
+            self._output.wait_for(lambda: self._seq != last_seq, timeout=timeout)
+            if self._seq == last_seq:
+                return last_seq, None
+            return self._seq, self._frame
+
+    def encode_variant(self, seq, frame, quality, scale):
+        """
+        JPEG for frame seq at a non-default quality/scale.
+
+        Encoded once per frame and variant; every client asking for the same
+        variant gets the same bytes.
+        """
+        key = (quality, scale)
+        with self._variants_lock:
+            cached = self._variants.get(key)
+            if cached is not None and cached[0] == seq:
+                return cached[1]
+            start = time.perf_counter()
+            if scale != 1.0:
+                frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            ret, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            self._timed("encode", start, seq)
+            data = jpeg.tobytes() if ret else None
+            self._variants[key] = (seq, data)
+            return data
+
+    def wait_for_events(self, last_id, timeout=1.0):
+        """Block until there are events newer than last_id. Returns them (empty on timeout)."""
+        with self._output:
+            self._output.wait_for(lambda: self.events.last_id > last_id, timeout=timeout)
+            return self.events.since(last_id)
+
+    def latest(self, timeout=2.0):
+        """
+        Get the most recently published frame state, waiting for the first frame if needed.
+
+        Returns:
+            dict: seq, keypoints, score, posture (PostureState.snapshot()) and jpeg for the latest
+            frame, or None if nothing was published in time.
+        """
+        with self._output:
+            self._output.wait_for(lambda: self._seq > 0, timeout=timeout)
+            if self._seq == 0:
+                return None
+            return {
+                "seq": self._seq,
+                "keypoints": self._keypoints,
+                "score": self._score,
+                "posture": self._posture,
+                "jpeg": self._jpeg
+            }
+
+    def client_connected(self, addr):
+        client_id = f"{addr}-{next(self._client_ids)}"
+        self.clients[client_id] = {"addr": addr, "since": time.time(), "frames": 0, "fps": 0.0, "_last": None}
+        return client_id
+
+    def client_sent(self, client_id):
+        client = self.clients.get(client_id)
+        if client is None:
+            return
+        now = time.perf_counter()
+        if client["_last"] is not None:
+            interval = now - client["_last"]
+            if interval > 0:
+                client["fps"] += 0.1 * (1.0 / interval - client["fps"])
+        client["_last"] = now
+        client["frames"] += 1
+
+    def client_disconnected(self, client_id):
+        self.clients.pop(client_id, None)
+
+    def snapshot(self):
+        return {
+            "profile": self.profile,
+            "target_fps": self.target_fps,
+            "frames_out": self._seq,
+            "dropped": dict(self.dropped),
+            "load_shedding": self.throttle.snapshot(),
+            "stages": {stage: timer.snapshot() for stage, timer in self.stats.items()}
+        }
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+_warmup_thread = None
+_warmup_lock = threading.Lock()  # not _pipeline_lock, that one is held while the camera and model load
+_startup_error = None
+
+
+def make_pose(model_complexity, static_image_mode=False):
+    import mediapipe as mp  # ~1s to import (it pulls in matplotlib), so only once a model is actually needed
+    return mp.solutions.pose.Pose(static_image_mode=static_image_mode, model_complexity=model_complexity)
+
+
+def get_pipeline():
+    """Open the webcam and pose model and start the shared frame pipeline on first use."""
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            cap = cv2.VideoCapture(CAMERA_INDEX)
+            if not cap.isOpened():
+                raise RuntimeError("Cannot open webcam")
+            try:
+                pose = make_pose(QUALITY_PROFILES[DEFAULT_PROFILE]["model_complexity"])
+            except Exception as e:
+                cap.release()
+                raise RuntimeError(f"Cannot load pose model: {e}") from e
+            _pipeline = FramePipeline(cap, pose, profile=DEFAULT_PROFILE).start()
+            if os.environ.get("POSE_RECORD"):
+                start_recording(_pipeline)
+        return _pipeline
+
+
+RECORDINGS_DIR = os.environ.get("POSE_RECORDINGS_DIR", "recordings")
+
+
+def start_recording(pipeline):
+    """Start recording the pipeline's frames to a new file in RECORDINGS_DIR. Returns the recorder."""
+    os.makedirs(RECORDINGS_DIR, exist_ok=True)
+    path = os.path.join(RECORDINGS_DIR, time.strftime("session-%Y%m%d-%H%M%S.pxkp"))
+    pipeline.recorder = KeypointRecorder(path, bits=int(os.environ.get("POSE_RECORD_BITS", 32)))
+    print(f"Recording keypoints to {path}")
+    return pipeline.recorder
+
+
+def stop_recording(pipeline):
+    recorder, pipeline.recorder = pipeline.recorder, None
+    if recorder is not None:
+        recorder.close()
+    return recorder
+
+
+def _warm_up():
+    global _startup_error
+    get_stations()
+    pose_library.refresh()
+    try:
+        get_pipeline()
+        _startup_error = None
+    except RuntimeError as e:
+        if str(e) != _startup_error:
+            print(f"Warm-up failed: {e}")
+        _startup_error = str(e)
+    pose_validator.tables()  # so the first /poses/check doesn't build them
+
+
+def warm_up():
+    """Load the pose library, model and camera on a background thread. Does nothing if already running or done."""
+    global _warmup_thread
+    with _warmup_lock:
+        if _pipeline is not None or (_warmup_thread is not None and _warmup_thread.is_alive()):
+            return
+        _warmup_thread = threading.Thread(target=_warm_up, name="warm-up", daemon=True)
+        _warmup_thread.start()
+
+
+def latest_frame_state():
+    """Latest published pipeline state, or None if the camera is unavailable or no frame is ready yet."""
+    try:
+        return get_pipeline().latest()
+    except RuntimeError as e:
+        print(e)
+        return None
+
+
+def generate_frames(pipeline, addr="unknown", fps=None, quality=None, scale=1.0):
+    # Every viewer streams the same encoded bytes; only the latest frame is ever sent.
+    # A slow client blocks on the socket write and just skips to whatever's newest when it
+    # comes back, a client that asked for a lower fps gets paced down to it here.
+    seq = 0
+    client_id = pipeline.client_connected(addr)
+    interval = 1.0 / fps if fps else 0.0
+    next_send = time.perf_counter()
+    variant = quality is not None or scale != 1.0
+
+    try:
+        while True:
+            delay = next_send - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+            if variant:
+                seq, frame = pipeline.wait_for_raw(seq)
+                frame_bytes = None if frame is None else pipeline.encode_variant(
+                    seq, frame, quality or QUALITY_PROFILES[pipeline.profile]["jpeg_quality"], scale)
+            else:
+                seq, frame_bytes = pipeline.wait_for_frame(seq)
+            if frame_bytes is None:
+                continue
+
+            # Keep a steady cadence, but don't burst to catch up after a stall
+            next_send = max(next_send + interval, time.perf_counter() - interval)
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n\r\n')
+            pipeline.client_sent(client_id)
+    finally:
+        pipeline.client_disconnected(client_id)
+
+
+class H264Stream:
+    """
+    Fragmented MP4 (H.264) version of the output, encoded by a local ffmpeg.
 
-        final_overlay = cv2.flip(final_overlay, 1)
+    Inter-frame coding needs a fraction of the bandwidth of MJPEG. One ffmpeg
+    process runs per (fps, scale) and its output is shared by every viewer.
+    Each fragment starts on a keyframe, so a viewer that joins late gets the
+    init segment plus the next fragment and can start decoding right away.
+    The encoder shuts down when the last viewer leaves.
+    """
 
-        ret, jpeg = cv2.imencode('.jpg', final_overlay)
+    def __init__(self, pipeline, fps, scale, bitrate="1M", max_fragments=8):
+        self.pipeline = pipeline
+        self.fps = fps
+        self.scale = scale
+        self.bitrate = bitrate
+        self.init_segment = None
+        self.fragments = deque(maxlen=max_fragments)  # (fragment number, bytes)
+        self.fragment_count = 0
+        self.subscribers = 0
+        self.alive = True
+        self._cond = threading.Condition()
+        self._process = None
+
+    def start(self, timeout=5.0):
+        """Start ffmpeg, sized from the first frame. Raises RuntimeError if no frame comes within timeout."""
+        _, frame = self.pipeline.wait_for_raw(0, timeout=timeout)
+        if frame is None:
+            raise RuntimeError("No frames from the camera yet")
+        height, width = frame.shape[:2]
+        # x264 wants even dimensions
+        self.size = (int(width * self.scale) // 2 * 2, int(height * self.scale) // 2 * 2)
+        self._process = subprocess.Popen(
+            ["ffmpeg", "-loglevel", "error",
+             "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{self.size[0]}x{self.size[1]}", "-r", str(self.fps), "-i", "-",
+             "-an", "-c:v", "libx264", "-preset", "ultrafast", "-tune", "zerolatency", "-pix_fmt", "yuv420p",
+             "-b:v", self.bitrate, "-g", str(max(self.fps // 2, 1)),
+             "-f", "mp4", "-movflags", "frag_keyframe+empty_moov+default_base_moof", "-"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        threading.Thread(target=self._feed, name="h264_feed", daemon=True).start()
+        threading.Thread(target=self._read, name="h264_read", daemon=True).start()
+        return self
+
+    def _feed(self):
+        seq = 0
+        interval = 1.0 / self.fps
+        next_send = time.perf_counter()
+        try:
+            while self.alive:
+                delay = next_send - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                seq, frame = self.pipeline.wait_for_raw(seq)
+                if frame is None:
+                    continue
+                next_send = max(next_send + interval, time.perf_counter() - interval)
+                if (frame.shape[1], frame.shape[0]) != self.size:
+                    frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+                self._process.stdin.write(frame.tobytes())
+        except (BrokenPipeError, ValueError):
+            pass
+        finally:
+            self.stop()
+
+    def _read(self):
+        # Split ffmpeg's output into MP4 boxes: ftyp+moov is the init segment, each moof+mdat a fragment
+        stdout = self._process.stdout
+        pending = b""
+        try:
+            while self.alive:
+                header = stdout.read(8)
+                if len(header) < 8:
+                    break
+                size, kind = struct.unpack(">I4s", header)
+                if size == 1:
+                    extended = stdout.read(8)
+                    size = struct.unpack(">Q", extended)[0]
+                    header += extended
+                box = header + stdout.read(size - len(header))
+                pending += box
+                if kind == b"moov":
+                    with self._cond:
+                        self.init_segment = pending
+                        self._cond.notify_all()
+                    pending = b""
+                elif kind == b"mdat":
+                    with self._cond:
+                        self.fragment_count += 1
+                        self.fragments.append((self.fragment_count, pending))
+                        self._cond.notify_all()
+                    pending = b""
+        finally:
+            self.stop()
+
+    def stop(self):
+        with self._cond:
+            if not self.alive:
+                return
+            self.alive = False
+            self._cond.notify_all()
+        if self._process is not None:
+            self._process.kill()
+
+    def subscribe(self):
+        """Yield the init segment and then every new fragment, for one viewer."""
+        with self._cond:
+            self.subscribers += 1
+        try:
+            with self._cond:
+                self._cond.wait_for(lambda: self.init_segment is not None or not self.alive, timeout=10.0)
+                if self.init_segment is None:
+                    return
+                init, last = self.init_segment, self.fragment_count
+            yield init
+
+            while self.alive:
+                with self._cond:
+                    self._cond.wait_for(lambda: self.fragment_count > last or not self.alive, timeout=5.0)
+                    # A viewer that fell behind the buffer skips ahead, every fragment starts on a keyframe
+                    ready = [(number, data) for number, data in self.fragments if number > last]
+                if ready:
+                    last = ready[-1][0]
+                    yield b"".join(data for _, data in ready)
+        finally:
+            with self._cond:
+                self.subscribers -= 1
+                if self.subscribers == 0:
+                    self.stop()
+
+
+_h264_streams = {}
+_h264_lock = threading.Lock()
+
+
+def get_h264_stream(pipeline, fps, scale, timeout=5.0):
+    """
+    The shared encoder for (fps, scale), started on first use. Raises RuntimeError if the
+    pipeline hasn't published a frame within timeout.
+    """
+    # Wait for the first frame before taking the lock, so a stalled camera can't hold every request up
+    if pipeline.wait_for_raw(0, timeout=timeout)[1] is None:
+        raise RuntimeError("No frames from the camera yet")
+    with _h264_lock:
+        stream = _h264_streams.get((fps, scale))
+        if stream is None or not stream.alive:
+            stream = H264Stream(pipeline, fps, scale, os.environ.get("H264_BITRATE", "1M")).start()
+            _h264_streams[(fps, scale)] = stream
+        return stream
+
+
+# --- Stations ---
+# One box can drive several play stations: every configured capture source gets its
+# own worker process with its own FramePipeline (so inference, rendering and JPEG
+# encoding run on separate cores instead of sharing this process's GIL), and the
+# workers hand their latest frame to the Flask process through shared memory.
+# Configure with POSE_STATIONS="front=0,side=rtsp://...,demo=clip.mp4" or --station.
+
+class LoopingCapture:
+    """A video file played back in real time and on repeat, stands in for a camera (demos, tests)."""
+
+    def __init__(self, path):
+        self.capture = cv2.VideoCapture(path)
+        fps = self.capture.get(cv2.CAP_PROP_FPS)
+        self.interval = 1.0 / fps if fps and fps > 0 else 1.0 / 30
+        self._next = time.perf_counter()
+
+    def isOpened(self):
+        return self.capture.isOpened()
+
+    def read(self):
+        delay = self._next - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        self._next = max(self._next + self.interval, time.perf_counter() - self.interval)
+        ret, frame = self.capture.read()
         if not ret:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.capture.read()
+        return ret, frame
+
+    def release(self):
+        self.capture.release()
+
+
+def open_capture(source):
+    """Open a device index ("0"), a video file (looped) or a stream URL (rtsp://, http://...)."""
+    if isinstance(source, int) or source.isdigit():
+        return cv2.VideoCapture(int(source))
+    if os.path.isfile(source):
+        return LoopingCapture(source)
+    return cv2.VideoCapture(source)
+
+
+def parse_stations(specs):
+    """Turn ["name=source", ...] into {name: source}. Raises ValueError on a bad spec."""
+    stations = {}
+    for spec in specs:
+        spec = spec.strip()
+        if not spec:
             continue
+        name, sep, source = spec.partition("=")
+        name, source = name.strip(), source.strip()
+        if not sep or not source or not name.replace("-", "").replace("_", "").isalnum():
+            raise ValueError(f"Bad station '{spec}', expected name=source with a name of letters, digits, - or _")
+        stations[name] = source
+    return stations
+
+
+class SharedFrameBuffer:
+    """
+    The latest encoded frame and its metadata (score, posture...) for one station, in shared memory.
+
+    There are two slots, written alternately, each stamped with the seq of the frame
+    in it. The writer clears a slot's seq, fills the slot, stamps it and then
+    publishes the seq in the header. Readers copy the slot the header points at and
+    only keep the copy if the stamp still matches afterwards, so a reader never
+    blocks the worker and never hands out a half-written frame.
+    """
 
-        for dot in dot_particles:
-            dot["x"] += dot["speed"] * dot["direction"]
+    HEADER = struct.Struct("<Q")  # seq of the latest complete frame
+    SLOT = struct.Struct("<QII")  # seq, jpeg length, metadata length
+    META_BYTES = 16 * 1024
+
+    def __init__(self, shm, frame_bytes):
+        self.shm = shm
+        self.name = shm.name
+        self.frame_bytes = frame_bytes
+        self.slot_bytes = self.SLOT.size + frame_bytes + self.META_BYTES
+
+    @classmethod
+    def create(cls, frame_bytes):
+        size = cls.HEADER.size + 2 * (cls.SLOT.size + frame_bytes + cls.META_BYTES)
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        shm.buf[:size] = bytes(size)
+        return cls(shm, frame_bytes)
+
+    @classmethod
+    def attach(cls, name, frame_bytes):
+        return cls(shared_memory.SharedMemory(name=name), frame_bytes)
+
+    def _slot(self, seq):
+        return self.HEADER.size + (seq % 2) * self.slot_bytes
+
+    def write(self, seq, jpeg, meta):
+        """Publish frame `seq` (> 0, increasing). Returns False if it doesn't fit and was skipped."""
+        meta = json.dumps(meta).encode()
+        if len(jpeg) > self.frame_bytes or len(meta) > self.META_BYTES:
+            return False
+        buf = self.shm.buf
+        offset = self._slot(seq)
+        data = offset + self.SLOT.size
+        self.SLOT.pack_into(buf, offset, 0, 0, 0)
+        buf[data:data + len(jpeg)] = jpeg
+        buf[data + self.frame_bytes:data + self.frame_bytes + len(meta)] = meta
+        self.SLOT.pack_into(buf, offset, seq, len(jpeg), len(meta))
+        self.HEADER.pack_into(buf, 0, seq)
+        return True
+
+    def read(self, last_seq=0):
+        """Returns (seq, jpeg bytes, metadata dict) for the latest frame, or (last_seq, None, None) if there's nothing newer."""
+        buf = self.shm.buf
+        for _ in range(3):
+            seq, = self.HEADER.unpack_from(buf, 0)
+            if seq == 0 or seq == last_seq:
+                break
+            offset = self._slot(seq)
+            stamp, jpeg_len, meta_len = self.SLOT.unpack_from(buf, offset)
+            if stamp != seq:
+                continue  # being rewritten, the header is about to move on
+            data = offset + self.SLOT.size
+            jpeg = bytes(buf[data:data + min(jpeg_len, self.frame_bytes)])
+            meta = bytes(buf[data + self.frame_bytes:data + self.frame_bytes + min(meta_len, self.META_BYTES)])
+            if self.SLOT.unpack_from(buf, offset)[0] == seq:
+                return seq, jpeg, json.loads(meta)
+        return last_seq, None, None
+
+    def wait_for_frame(self, last_seq, timeout=1.0, poll=0.005):
+        """Poll until a frame newer than last_seq is published. Returns like read()."""
+        deadline = time.perf_counter() + timeout
+        while True:
+            seq, jpeg, meta = self.read(last_seq)
+            if jpeg is not None or time.perf_counter() >= deadline:
+                return seq, jpeg, meta
+            time.sleep(poll)
+
+    def close(self):
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+def station_worker(name, source, buffer_name, frame_bytes, profile, target_fps, stop):
+    """Worker process for one station: run a FramePipeline on `source` and publish every frame."""
+    os.environ.pop("POSE_WARM_UP", None)  # this process only runs its own pipeline, never the main one
+    buffer = SharedFrameBuffer.attach(buffer_name, frame_bytes)
+    capture = open_capture(source)
+    if not capture.isOpened():
+        print(f"[{name}] Cannot open capture source {source!r}")
+        buffer.close()
+        sys.exit(1)
+    try:
+        pose = make_pose(QUALITY_PROFILES[profile]["model_complexity"])
+    except Exception as e:
+        print(f"[{name}] Cannot load pose model: {e}")
+        capture.release()
+        buffer.close()
+        sys.exit(1)
+    pipeline = FramePipeline(capture, pose, target_fps=target_fps, profile=profile, verbose=False).start()
+
+    seq = 0
+    try:
+        while not stop.is_set():
+            seq, jpeg = pipeline.wait_for_frame(seq)
+            if jpeg is None:
+                continue
+            state = pipeline.latest()
+            seq = state["seq"]
+            buffer.write(seq, state["jpeg"], {"score": state["score"], "posture": state["posture"],
+                                              "pose_id": pipeline.game.pose_id, "inferences": pipeline.inferences,
+                                              "time": time.time()})
+    except KeyboardInterrupt:
+        pass  # Ctrl+C reaches the whole process group, the supervisor cleans up
+    finally:
+        pipeline.stop()
+        buffer.close()
 
-            if dot["x"] < 0 or dot["x"] > WIDTH:
-                # Reset off-screen dots
-                dot["x"] = 0 if dot["direction"] > 0 else WIDTH
-                dot["y"] = random.randint(0, HEIGHT)
-                dot["speed"] = random.uniform(1.0, 4.0)
-                dot["radius"] = random.randint(2, 5)
-                dot["gray"] = random.randint(60, 120)
-                dot["direction"] = random.choice([-1, 1])
 
-        frame_counter += 1  # move dots
-        frame_bytes = jpeg.tobytes()
+class StationSupervisor:
+    """
+    Spawns one station_worker process per capture source and restarts the ones that
+    exit, backing off up to max_backoff seconds between attempts (the backoff starts
+    over once a worker has stayed up for a minute).
+
+    Each station's worker writes into a SharedFrameBuffer sized for the largest
+    quality profile, the Flask side only ever reads from those buffers.
+    """
+
+    FRAME_BYTES = max(settings["width"] * settings["height"] for settings in QUALITY_PROFILES.values())
+
+    def __init__(self, sources, profile=DEFAULT_PROFILE, target_fps=30, max_backoff=30.0):
+        self.sources = dict(sources)
+        self.profile = profile
+        self.target_fps = target_fps
+        self.max_backoff = max_backoff
+        # Spawned, not forked, so every worker gets a fresh MediaPipe graph and no copies of our threads
+        self.context = multiprocessing.get_context("spawn")
+        self.stations = {}  # name -> {"source", "buffer", "process", "stop", "started", "restarts", "failures", "retry_at"}
+        self._stop = threading.Event()
+        self._monitor = None
+
+    def start(self):
+        for name, source in self.sources.items():
+            self.stations[name] = {"source": source, "buffer": SharedFrameBuffer.create(self.FRAME_BYTES),
+                                   "process": None, "stop": None, "started": None, "restarts": 0, "failures": 0,
+                                   "retry_at": None}
+            self._spawn(name)
+        self._monitor = threading.Thread(target=self._watch, name="station-monitor", daemon=True)
+        self._monitor.start()
+        return self
+
+    def _spawn(self, name):
+        station = self.stations[name]
+        station["stop"] = self.context.Event()
+        station["process"] = self.context.Process(
+            target=station_worker, name=f"station-{name}", daemon=True,
+            args=(name, station["source"], station["buffer"].name, self.FRAME_BYTES, self.profile,
+                  self.target_fps, station["stop"]))
+        station["process"].start()
+        station["started"] = time.time()
+        station["retry_at"] = None
+
+    def _watch(self):
+        while not self._stop.wait(0.5):
+            now = time.time()
+            for name, station in self.stations.items():
+                if station["process"].is_alive():
+                    continue
+                if station["retry_at"] is None:
+                    if now - station["started"] > 60:
+                        station["failures"] = 0
+                    delay = min(self.max_backoff, 2.0 ** station["failures"])
+                    station["failures"] += 1
+                    print(f"Station {name} exited with code {station['process'].exitcode}, restarting in {delay:.0f}s")
+                    station["retry_at"] = now + delay
+                elif now >= station["retry_at"] and not self._stop.is_set():
+                    station["restarts"] += 1
+                    self._spawn(name)
+
+    def buffer(self, name):
+        station = self.stations.get(name)
+        return station["buffer"] if station else None
+
+    def status(self):
+        stations = {}
+        for name, station in self.stations.items():
+            seq, _, meta = station["buffer"].read()
+            process = station["process"]
+            stations[name] = {
+                "source": station["source"],
+                "alive": process.is_alive(),
+                "pid": process.pid,
+                "restarts": station["restarts"],
+                "frames_out": seq,
+                "last_frame_age": round(time.time() - meta["time"], 3) if meta else None
+            }
+        return {"profile": self.profile, "stations": stations}
+
+    def stop(self):
+        self._stop.set()
+        for station in self.stations.values():
+            station["stop"].set()
+        for station in self.stations.values():
+            station["process"].join(timeout=2.0)
+            if station["process"].is_alive():
+                station["process"].terminate()
+                station["process"].join(timeout=1.0)
+            station["buffer"].close()
+            station["buffer"].unlink()
+
+
+STATIONS = parse_stations(os.environ.get("POSE_STATIONS", "").split(","))
+_stations = None
+_stations_lock = threading.Lock()
+
+
+def get_stations():
+    """Start the station workers on first use. Returns None if no stations are configured."""
+    global _stations
+    with _stations_lock:
+        if _stations is None and STATIONS:
+            _stations = StationSupervisor(STATIONS, profile=DEFAULT_PROFILE).start()
+        return _stations
+
+
+def generate_station_frames(buffer, fps=None):
+    # Same multipart framing as generate_frames(), straight from the station's shared buffer
+    seq = 0
+    interval = 1.0 / fps if fps else 0.0
+    next_send = time.perf_counter()
+    while True:
+        delay = next_send - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        seq, frame_bytes, _ = buffer.wait_for_frame(seq)
+        if frame_bytes is None:
+            continue
+        next_send = max(next_send + interval, time.perf_counter() - interval)
         yield (b'--frame\r\n'
                b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n\r\n')
 
 
+def generate_events(pipeline, last_id=None, min_interval=0.1, keepalive=15.0):
+    """
+    Server-Sent Events stream of GameEvents for one client.
+
+    Sends at most one batch per min_interval; within a batch score updates are
+    coalesced down to the newest one, pose and shrimp changes are all sent.
+    A client reconnecting with Last-Event-ID picks up the events it missed.
+    A new client first gets a "hello" with the current score, pose and settled
+    posture, since shrimp events only come when the flag flips. So does one
+    whose Last-Event-ID can't be caught up from: from before a server restart,
+    or so far behind that the events it missed were already dropped.
+    """
+    with pipeline._output:
+        if last_id is None or not pipeline.events.covers(last_id):
+            # Start from the current state rather than replaying history
+            last_id = pipeline.events.last_id
+            posture = pipeline._posture
+            state = {"score": pipeline._score, "frame": pipeline._seq, "pose_id": pipeline.game.pose_id,
+                     "isShrimp": bool(posture and posture["isShrimp"]), "posture": posture}
+        else:
+            state = None
+    if state is not None:
+        yield f"event: hello\ndata: {json.dumps(state)}\n\n"
+
+    last_sent = time.perf_counter()
+    while True:
+        events = pipeline.wait_for_events(last_id, timeout=keepalive)
+        if not events:
+            yield ": keepalive\n\n"
+            continue
 
-def get_score(image):
+        # Debounce: let a few frames' worth of changes pile up, then send them together
+        wait = min_interval - (time.perf_counter() - last_sent)
+        if wait > 0:
+            time.sleep(wait)
+            events = pipeline.wait_for_events(last_id, timeout=0)
+
+        newest_score = max((event[0] for event in events if event[1] == "score"), default=None)
+        chunks = []
+        for event_id, kind, data in events:
+            if kind == "score" and event_id != newest_score:
+                continue
+            chunks.append(f"id: {event_id}\nevent: {kind}\ndata: {json.dumps(data)}\n\n")
+        last_id = events[-1][0]
+        last_sent = time.perf_counter()
+        yield "".join(chunks)
+
+
+def prometheus_metrics(pipeline):
+    """Render the pipeline counters in the Prometheus text format."""
+    lines = [
+        "# HELP pixelpose_stage_seconds Time spent in each frame pipeline stage.",
+        "# TYPE pixelpose_stage_seconds histogram",
+    ]
+    for stage, timer in pipeline.stats.items():
+        lines.extend(timer.prometheus("pixelpose_stage_seconds", f'stage="{stage}"'))
+    lines += [
+        "# HELP pixelpose_jpeg_bytes Size of each encoded output frame.",
+        "# TYPE pixelpose_jpeg_bytes histogram",
+    ]
+    lines.extend(pipeline.jpeg_bytes.prometheus("pixelpose_jpeg_bytes"))
+    lines += [
+        "# HELP pixelpose_frames_out_total Frames rendered and encoded.",
+        "# TYPE pixelpose_frames_out_total counter",
+        f"pixelpose_frames_out_total {pipeline._seq}",
+        "# HELP pixelpose_dropped_total Items dropped from a full pipeline queue.",
+        "# TYPE pixelpose_dropped_total counter",
+    ]
+    for queue_name, count in pipeline.dropped.items():
+        lines.append(f'pixelpose_dropped_total{{queue="{queue_name}"}} {count}')
+    lines += [
+        "# HELP pixelpose_inferences_total Pose estimation runs.",
+        "# TYPE pixelpose_inferences_total counter",
+        f"pixelpose_inferences_total {pipeline.inferences}",
+        "# HELP pixelpose_missing_keypoints_total Pose estimation runs that found nobody.",
+        "# TYPE pixelpose_missing_keypoints_total counter",
+        f"pixelpose_missing_keypoints_total {pipeline.missing_keypoints}",
+        "# HELP pixelpose_inference_skipped_total Frames the load shedder skipped inference on.",
+        "# TYPE pixelpose_inference_skipped_total counter",
+        f"pixelpose_inference_skipped_total {pipeline.throttle.skipped}",
+        "# HELP pixelpose_inference_decimation Run pose estimation every Nth frame.",
+        "# TYPE pixelpose_inference_decimation gauge",
+        f"pixelpose_inference_decimation {pipeline.throttle.factor}",
+        "# HELP pixelpose_inference_duty Share of wall time pose estimation may use.",
+        "# TYPE pixelpose_inference_duty gauge",
+        f"pixelpose_inference_duty {pipeline.throttle.duty}",
+        "# HELP pixelpose_target_fps Output frame rate the render loop aims for.",
+        "# TYPE pixelpose_target_fps gauge",
+        f"pixelpose_target_fps {pipeline.target_fps}",
+        "# HELP pixelpose_client_fps Achieved frame rate per connected /video_feed client.",
+        "# TYPE pixelpose_client_fps gauge",
+    ]
+    for client_id, client in list(pipeline.clients.items()):
+        lines.append(f'pixelpose_client_fps{{client="{client_id}"}} {round(client["fps"], 2)}')
+    lines += [
+        "# HELP pixelpose_clients Connected /video_feed clients.",
+        "# TYPE pixelpose_clients gauge",
+        f"pixelpose_clients {len(pipeline.clients)}",
+        "# HELP pixelpose_sessions Live remote player sessions.",
+        "# TYPE pixelpose_sessions gauge",
+        f"pixelpose_sessions {len(sessions)}",
+        "# HELP pixelpose_sessions_evicted_total Remote player sessions dropped for being idle or over the limit.",
+        "# TYPE pixelpose_sessions_evicted_total counter",
+        f"pixelpose_sessions_evicted_total {sessions.evicted}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+
+def get_score(image, pose_array, occupancy=None):
     """
     Calculate score based on highlighted boxes in the image.
     Adds 10 points for each correct box the player is in.
-    Subtracts 10 points for each incorrect box the player is in.
+    Subtracts 5 points for each incorrect box the player is in.
     
     Args:
         image: The processed image with highlighted boxes
+        pose_array: The target pose grid to score against
+        occupancy: Optional precomputed cell_occupancy() grid for image
         
     Returns:
         dict: Score data including points, boxes lit, etc.
     """
-    global test_array  # This is critical - declare it's using the global variable
-    
-    height, width, _ = image.shape
-    grid_size = 120
-    
-    # White mask to detect player's presence (white pixels)
-    white_mask = np.all(image == [255, 255, 255], axis=-1)
-    
-    rows = height // grid_size
-    cols = width // grid_size
-    
-    score = 0
-    total_boxes = 0
-    boxes_lit = 0
-    incorrect_boxes = 0
-    
-    for row in range(rows):
-        for col in range(cols):
-            x = col * grid_size
-            y = row * grid_size
-            
-            # Map to test_array coordinates
-            test_row = min(row * len(test_array) // rows, len(test_array) - 1)
-            test_col = min(col * len(test_array[0]) // cols, len(test_array[0]) - 1)
-            
-            # Check if the player is in this box (white pixels present)
-            region = white_mask[y:y + grid_size, x:x + grid_size]
-            player_in_box = np.any(region)
-            
-            # Check if this is a box that should be lit up
-            if test_array[test_row][test_col] == 1:
-                total_boxes += 1
-                
-                if player_in_box:
-                    score += 10  # Award 10 points for each correct box
-                    boxes_lit += 1
-            else:
-                # If player is in a box they shouldn't be in, subtract points
-                if player_in_box:
-                    score -= 5  # Subtract 10 points for incorrect placement
-                    incorrect_boxes += 1
-    
+    if occupancy is None:
+        occupancy = cell_occupancy(image)
+    return score_occupancy(occupancy, pose_array)
+
+
+def score_occupancy(occupancy, pose_array):
+    """Score a boolean cell occupancy grid against the pose_array target."""
+    rows, cols = occupancy.shape
+    target = target_grid(pose_array, rows, cols)
+
+    total_boxes = int(np.count_nonzero(target))
+    boxes_lit = int(np.count_nonzero(occupancy & target))
+    incorrect_boxes = int(np.count_nonzero(occupancy & ~target))
+
+    # 10 points for each correct box, minus 5 for each box the player shouldn't be in
+    score = boxes_lit * 10 - incorrect_boxes * 5
+
     score_data = {
         "score": max(score, 0),
         "max_possible": total_boxes * 10,
@@ -466,38 +2676,621 @@ def get_score(image):
     }
     
     return score_data
-@app.route('/video_feed')
+
+# --- Pose feasibility ---
+# A drawnPose is only worth sharing if a body can actually fill it. PoseValidator
+# searches stick figures with human proportions for the layout that scores best
+# against the grid under score_occupancy() rules. Candidates are scored on a coarse
+# raster (RASTER px per cell) where every limb segment is a lookup in a table of
+# precomputed cell masks, and the best few are re-scored exactly from body_shapes().
+
+# Body proportions in torso lengths (shoulder midpoint to hip midpoint), about adult averages
+BODY_PROPORTIONS = {"shoulders": 0.7, "hips": 0.5, "neck": 0.45, "ear": 0.15,
+                    "upper_arm": 0.62, "forearm": 0.5, "thigh": 0.82, "shin": 0.8}
+# A pose is doable if some body layout scores at least this much of max_possible. Drawings are
+# rough, so even a fixture rendered from real keypoints rarely gets all the way there.
+FEASIBLE_RATIO = 0.6
+
+
+class PoseValidator:
+    """
+    Best reachable score for a drawnPose, found by searching body layouts.
+
+    The torso (with head and neck) is placed on every target cell at each size,
+    lean and turn, ranked on its own, and the best few per size get a limb search:
+    each limb picks an upper segment angle/length, then the lower segment from
+    the BEAM best elbows/knees, with the other limbs held fixed, for two rounds.
+    Limb masks come from tables built once per segment length, covering every
+    angle and sub-cell anchor offset, so a whole round is a handful of numpy
+    gathers. A limb pointing at the camera looks shorter, so every segment is
+    also tried at the FORESHORTENING fractions of its length.
+    """
+
+    TORSO_LENGTHS = (140, 180, 230, 290, 370, 470)  # px, from standing well back to close up
+    LEANS = (-20, 0, 20)  # degrees
+    TURNS = (1.0, 0.6)  # shoulder/hip width facing the camera and turned partly sideways
+    FORESHORTENING = (0.55, 0.8, 1.0)
+    ANGLES = 24
+    SUBCELL = 3  # limb anchor positions per cell (each way) in the tables
+    RASTER = 8  # px per cell on the coarse raster
+    TORSOS = 2  # best torso placements per torso length that get a limb search
+    BEAM = 16  # upper limb placements the lower segment is searched from
+    ROUNDS = 2
+    EXACT = 3  # layouts re-scored with shape_occupancy() at the end
+
+    LIMBS = [
+        ("left_shoulder", "left_elbow", "left_wrist", "upper_arm", "forearm"),
+        ("right_shoulder", "right_elbow", "right_wrist", "upper_arm", "forearm"),
+        ("left_hip", "left_knee", "left_ankle", "thigh", "shin"),
+        ("right_hip", "right_knee", "right_ankle", "thigh", "shin"),
+    ]
+
+    def __init__(self, rows=HEIGHT // GRID_SIZE, cols=WIDTH // GRID_SIZE):
+        self.rows = rows
+        self.cols = cols
+        angles = np.arange(self.ANGLES) * 2 * np.pi / self.ANGLES
+        self.directions = np.stack([np.cos(angles), np.sin(angles)], axis=1)
+        self._tables = None
+        self._lock = threading.Lock()
+
+    def tables(self):
+        """
+        The precomputed cell masks, built on first use: {(segment, torso length, foreshortening):
+        (length, masks, radius)} for limbs and {(torso length, lean, turn): (masks, radius)} for torsos.
+        """
+        with self._lock:
+            if self._tables is None:
+                limbs = {
+                    (segment, torso, factor): self._segment_table(factor * BODY_PROPORTIONS[segment] * torso,
+                                                                  ring=segment == "forearm")
+                    for torso in self.TORSO_LENGTHS for factor in self.FORESHORTENING
+                    for segment in ("upper_arm", "forearm", "thigh", "shin")
+                }
+                torsos = {(torso, lean, turn): self._torso_table(torso, np.radians(lean), turn)
+                          for torso in self.TORSO_LENGTHS for lean in self.LEANS for turn in self.TURNS}
+                self._tables = limbs, torsos
+            return self._tables
+
+    def _segment_table(self, length, ring):
+        """
+        Cell masks of one limb box (plus the palm ring on forearms) at every angle and sub-cell
+        anchor offset: (angles, SUBCELL, SUBCELL, 2r+1, 2r+1) windows centered on the anchor cell.
+        """
+        scale = self.RASTER / GRID_SIZE
+        reach = length * (1.25 if ring else 1.05)
+        radius = int(np.ceil(reach / GRID_SIZE)) + 1
+        size = (2 * radius + 1) * self.RASTER
+        sub = (np.arange(self.SUBCELL) + 0.5) / self.SUBCELL
+        anchors = (radius + np.stack(np.meshgrid(sub, sub), axis=-1)) * self.RASTER  # (sy, sx, xy)
+        anchors = np.broadcast_to(anchors, (self.ANGLES,) + anchors.shape)
+        ends = anchors + (self.directions * length * scale)[:, None, None]
+        offsets = (self.directions[:, ::-1] * [-1, 1] * 0.1 * length * scale)[:, None, None]
+        boxes = np.round(np.stack([anchors + offsets, anchors - offsets, ends - offsets, ends + offsets],
+                                  axis=-2)).astype(np.int32)
+        ends = np.round(ends).astype(int)
+        ring_radius = int(round(0.2 * length * scale))
+
+        canvas = np.zeros((self.ANGLES, self.SUBCELL, self.SUBCELL, size, size), dtype=np.uint8)
+        for index in np.ndindex(canvas.shape[:3]):
+            cv2.fillConvexPoly(canvas[index], boxes[index], 1)
+            if ring:
+                cv2.circle(canvas[index], tuple(ends[index].tolist()), ring_radius, 1, 1)
+        masks = canvas.reshape(canvas.shape[:3] + (2 * radius + 1, self.RASTER, 2 * radius + 1, self.RASTER))
+        masks = masks.any(axis=(4, 6))
+        return length, masks, radius
+
+    def _place(self, windows, rows, cols, radius):
+        """Move (n, w, w) windows onto the scoring grid, centered on cells (rows[i], cols[i]): (n, cells)."""
+        size = 2 * radius + 1
+        r = np.arange(self.rows)[None, :] - rows[:, None] + radius
+        c = np.arange(self.cols)[None, :] - cols[:, None] + radius
+        inside = ((r >= 0) & (r < size))[:, :, None] & ((c >= 0) & (c < size))[:, None, :]
+        grid = windows[np.arange(len(windows))[:, None, None], np.clip(r, 0, size - 1)[:, :, None],
+                       np.clip(c, 0, size - 1)[:, None, :]]
+        return (grid & inside).reshape(len(windows), -1)
+
+    def _segments(self, anchors, table):
+        """Masks (n, angles, cells) and end points (n, angles, 2) of a segment from each of n anchors."""
+        length, windows, radius = table
+        cells = np.floor(anchors / GRID_SIZE).astype(np.int64)
+        sub = np.clip(((anchors - cells * GRID_SIZE) * self.SUBCELL // GRID_SIZE).astype(np.int64),
+                      0, self.SUBCELL - 1)
+        local = windows[:, sub[:, 1], sub[:, 0]].swapaxes(0, 1)  # (n, angles, w, w)
+        masks = self._place(local.reshape(-1, *local.shape[2:]), np.repeat(cells[:, 1], self.ANGLES),
+                            np.repeat(cells[:, 0], self.ANGLES), radius)
+        ends = anchors[:, None, :] + self.directions[None] * length
+        return masks.reshape(len(anchors), self.ANGLES, -1), ends
+
+    @staticmethod
+    def _score(masks, target):
+        hits = np.count_nonzero(masks & target, axis=-1)
+        return hits * 10 - (np.count_nonzero(masks, axis=-1) - hits) * 5
+
+    def _torso(self, center, torso, lean, turn):
+        """Joint positions (px) of the torso and head."""
+        up = np.array([np.sin(lean), -np.cos(lean)])
+        across = np.array([np.cos(lean), np.sin(lean)])
+        shoulders = center + up * torso / 2
+        hips = center - up * torso / 2
+        nose = shoulders + up * BODY_PROPORTIONS["neck"] * torso
+        half_shoulders = across * BODY_PROPORTIONS["shoulders"] * torso * turn / 2
+        half_hips = across * BODY_PROPORTIONS["hips"] * torso * turn / 2
+        ear = across * BODY_PROPORTIONS["ear"] * torso
+        return {"nose": nose, "left_ear": nose + ear, "right_ear": nose - ear,
+                "left_shoulder": shoulders + half_shoulders, "right_shoulder": shoulders - half_shoulders,
+                "left_hip": hips + half_hips, "right_hip": hips - half_hips}
+
+    def _torso_table(self, torso, lean, turn):
+        """Cell masks of the torso, neck and helmet around a torso center at every sub-cell offset."""
+        radius = int(np.ceil(1.15 * torso / GRID_SIZE)) + 1
+        size = 2 * radius + 1
+        masks = np.zeros((self.SUBCELL, self.SUBCELL, size, size), dtype=bool)
+        canvas = np.zeros((size * self.RASTER, size * self.RASTER), dtype=np.uint8)
+        for sy in range(self.SUBCELL):
+            for sx in range(self.SUBCELL):
+                center = (radius + (np.array([sx, sy]) + 0.5) / self.SUBCELL) * GRID_SIZE
+                masks[sy, sx] = self._torso_mask(self._torso(center, torso, lean, turn), canvas)
+        return masks, radius
+
+    def _torso_mask(self, joints, canvas):
+        """Coarse cell mask of the torso polygon, neck and helmet, drawn like body_shapes() does."""
+        scale = self.RASTER / GRID_SIZE
+
+        def pt(point):
+            return tuple(int(v) for v in np.round(point * scale))
+
+        canvas[:] = 0
+        cv2.fillConvexPoly(canvas, np.array([pt(joints[name]) for name in POLYGON_REGIONS["torso"]],
+                                            dtype=np.int32), 1)
+        neck = (joints["left_shoulder"] + joints["right_shoulder"]) / 2
+        cv2.line(canvas, pt(neck), pt(joints["nose"]), 1, max(int(round(50 * scale)), 1))
+        helmet = 0.75 * 1.6 * np.linalg.norm(joints["left_ear"] - joints["nose"])
+        cv2.circle(canvas, pt(joints["nose"]), int(round(helmet * scale)), 1, -1)
+        rows, cols = canvas.shape[0] // self.RASTER, canvas.shape[1] // self.RASTER
+        return canvas.reshape(rows, self.RASTER, cols, self.RASTER).any(axis=(1, 3))
+
+    def _limb(self, base, target, joints, limb, tables):
+        """Best placement of one limb given everything else: (cell mask, mid joint, end joint)."""
+        anchor, _, _, upper, lower = limb
+        upper_masks, upper_ends = [], []
+        for table in tables[upper]:
+            masks, ends = self._segments(joints[anchor][None], table)
+            upper_masks.append(masks[0])
+            upper_ends.append(ends[0])
+        upper_masks = np.concatenate(upper_masks)
+        upper_ends = np.concatenate(upper_ends)
+        keep = np.argsort(-self._score(base | upper_masks, target), kind="stable")[:self.BEAM]
+
+        best = None
+        for table in tables[lower]:
+            masks, ends = self._segments(upper_ends[keep], table)
+            masks |= upper_masks[keep][:, None]
+            scores = self._score(base | masks, target)
+            i, a = np.unravel_index(np.argmax(scores), scores.shape)
+            if best is None or scores[i, a] > best[0]:
+                best = (scores[i, a], masks[i, a], upper_ends[keep[i]], ends[i, a])
+        return best[1:]
+
+    def _search(self, target):
+        """Coarse search, returns [(estimated score, joints)] best first."""
+        limb_tables, torso_tables = self.tables()
+        # Torso centers: every sub-cell anchor position of every target cell
+        cells = np.argwhere(target.reshape(self.rows, self.cols))
+        sub = np.stack(np.divmod(np.arange(self.SUBCELL ** 2), self.SUBCELL), axis=1)
+        cells, sub = np.repeat(cells, len(sub), axis=0), np.tile(sub, (len(cells), 1))
+        centers = (cells[:, ::-1] + (sub[:, ::-1] + 0.5) / self.SUBCELL) * GRID_SIZE
+        poses = [(lean, turn) for lean in self.LEANS for turn in self.TURNS]
+
+        layouts = []
+        for torso in self.TORSO_LENGTHS:
+            masks = []
+            for lean, turn in poses:
+                windows, radius = torso_tables[torso, lean, turn]
+                masks.append(self._place(windows[sub[:, 0], sub[:, 1]], cells[:, 0], cells[:, 1], radius))
+            masks = np.concatenate(masks)
+            scores = self._score(masks, target)
+
+            segments = {segment: [limb_tables[segment, torso, factor] for factor in self.FORESHORTENING]
+                        for segment in ("upper_arm", "forearm", "thigh", "shin")}
+            for best in np.argsort(-scores, kind="stable")[:self.TORSOS]:
+                lean, turn = poses[best // len(centers)]
+                joints = self._torso(centers[best % len(centers)], torso, np.radians(lean), turn)
+                torso_mask = masks[best]
+                limb_masks = [np.zeros(target.size, dtype=bool) for _ in self.LIMBS]
+                for _ in range(self.ROUNDS):
+                    for i, limb in enumerate(self.LIMBS):
+                        others = [mask for j, mask in enumerate(limb_masks) if j != i]
+                        base = torso_mask | np.logical_or.reduce(others)
+                        limb_masks[i], joints[limb[1]], joints[limb[2]] = self._limb(base, target, joints, limb,
+                                                                                     segments)
+                body = torso_mask | np.logical_or.reduce(limb_masks)
+                layouts.append((int(self._score(body, target)), joints))
+
+        layouts.sort(key=lambda layout: -layout[0])
+        return layouts
+
+    def keypoints(self, joints):
+        """A movenet()-shaped (1, 1, 33, 3) array with the given joints (px) fully visible."""
+        keypoints = np.zeros((1, 1, len(KEYPOINT_NAMES), 3))
+        for name, (x, y) in joints.items():
+            keypoints[0, 0, KEYPOINT_NAMES.index(name)] = [y / HEIGHT, x / WIDTH, 1.0]
+        return keypoints
+
+    def validate(self, pose_array):
+        """
+        Search for the body layout that scores best on pose_array (a drawnPose or scoring grid).
+
+        Returns:
+            dict: score_occupancy() data for the best layout found, plus "ratio" (score / max_possible),
+            "feasible" (ratio >= FEASIBLE_RATIO) and "keypoints" of that layout (or None)
+        """
+        target = target_grid(pose_array, self.rows, self.cols)
+        best = score_occupancy(np.zeros_like(target), target)
+        keypoints = None
+        if target.any():
+            for _, joints in self._search(target.ravel())[:self.EXACT]:
+                candidate = self.keypoints(joints)
+                score_data = score_occupancy(shape_occupancy(body_shapes(candidate)), target)
+                if keypoints is None or score_data["score"] > best["score"]:
+                    best, keypoints = score_data, candidate
+
+        ratio = best["score"] / best["max_possible"] if best["max_possible"] else 0.0
+        return {**best, "ratio": round(ratio, 4), "feasible": ratio >= FEASIBLE_RATIO, "keypoints": keypoints}
+
+
+pose_validator = PoseValidator()
+
+
+def check_pose_database(filename='db.json'):
+    """
+    Validate the poses in filename that have no up-to-date feasibility verdict and save
+    the verdicts into the file. A fraction of a second per pose, so this runs offline
+    (`flask_app.py --check-poses`), never from the game loop.
+
+    Returns:
+        int: number of poses checked
+    """
+    library = PoseLibrary(filename)
+    library.refresh()
+    verdicts = {}
+    for pose_id, grid in library.grids.items():
+        if pose_id in library.feasibility:
+            continue
+        verdicts[pose_id] = verdict = library.verdict(grid, pose_validator.validate(grid))
+        print(f"Pose {pose_id}: best body layout scores {verdict['score']} / {verdict['max_possible']}"
+              + ("" if verdict["feasible"] else ", impossible to fill"))
+
+    if verdicts:
+        data = load_pose_database(filename)
+        for pose in data.get('poses', []):
+            if pose.get('id') in verdicts:
+                pose['feasibility'] = verdicts[pose['id']]
+        with open(filename, 'w') as file:
+            json.dump(data, file, indent=2)
+    return len(verdicts)
+
+
+# --- Remote players ---
+# Clients that run pose estimation themselves (e.g. MediaPipe in the browser) send
+# keypoints instead of video. Each player gets a session with its own target pose,
+# and only the geometry scoring + shrimp check run here, no camera or inference.
+
+KEYPOINT_FRAME_BYTES = 33 * 3 * 4  # one frame of little-endian float32 [y, x, visibility]
+MAX_INGEST_FRAMES = 64
+MAX_KEYPOINT_COORD = 10.0  # |y|, |x| limit for ingested keypoints, in frame widths/heights
+
+
+class PlayerSession:
+    """One remote player: their GameState plus bookkeeping for the session registry."""
+
+    def __init__(self, session_id):
+        self.id = session_id
+        self.game = GameState(particles=False)  # remote clients draw their own background
+        self.score = None
+        self.last_seen = time.time()
+        self.lock = threading.Lock()
+
+    def state(self):
+        game = self.game
+        return {
+            "session": self.id,
+            "pose_id": game.pose_id,
+            "target": target_grid(game.pose_array, pose_library.rows, pose_library.cols).astype(int).tolist(),
+            "pose_seconds": round(time.time() - game.pose_started, 1),
+            "frames": game.frame_counter,
+            "score": self.score,
+            "best_score": max(game.score_history, default=0)
+        }
+
+
+class SessionRegistry:
+    """
+    Remote player sessions, kept in least-recently-used order.
+
+    Sessions idle for longer than idle_timeout seconds are dropped, and past
+    max_sessions the least recently used one goes, so memory stays bounded no
+    matter how many clients come and go. Sessions live in this process, so run
+    multiple workers behind a load balancer with sticky sessions.
+    """
+
+    def __init__(self, max_sessions=500, idle_timeout=300.0):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.evicted = 0
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _evict(self, now):
+        # Oldest first, so stop at the first session that's still active
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if len(self._sessions) <= self.max_sessions and now - session.last_seen <= self.idle_timeout:
+                break
+            self._sessions.popitem(last=False)
+            self.evicted += 1
+
+    def create(self):
+        session = PlayerSession(os.urandom(8).hex())
+        with self._lock:
+            self._sessions[session.id] = session
+            self._evict(session.last_seen)
+        return session
+
+    def get(self, session_id):
+        """Look up a session and mark it as used. Returns None if it doesn't exist or was evicted."""
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_seen = now
+                self._sessions.move_to_end(session_id)
+            return session
+
+
+sessions = SessionRegistry(max_sessions=int(os.environ.get("MAX_SESSIONS", 500)),
+                           idle_timeout=float(os.environ.get("SESSION_IDLE_TIMEOUT", 300)))
+
+
+def parse_keypoint_frames(req):
+    """
+    Read a batch of keypoint frames from an ingest request, as an (n, 33, 3) float array.
+
+    Takes either JSON {"keypoints": ...} with one frame (33x3) or a list of frames,
+    or an application/octet-stream body of packed float32 frames.
+    """
+    if req.mimetype == 'application/octet-stream':
+        body = req.get_data()
+        if not body or len(body) % KEYPOINT_FRAME_BYTES:
+            raise ValueError(f"Binary body must be a multiple of {KEYPOINT_FRAME_BYTES} bytes (float32 33x3 frames)")
+        frames = np.frombuffer(body, dtype='<f4').reshape(-1, 33, 3).astype(np.float64)
+    else:
+        body = req.get_json(silent=True)
+        if not isinstance(body, dict) or "keypoints" not in body:
+            raise ValueError("Expected a JSON body with a 'keypoints' field")
+        try:
+            frames = np.asarray(body["keypoints"], dtype=np.float64)
+        except (TypeError, ValueError):
+            raise ValueError("keypoints must be numbers in a 33x3 [y, x, visibility] layout")
+        if frames.shape[-2:] != (33, 3):
+            raise ValueError(f"keypoints must be 33x3 [y, x, visibility] per frame, got shape {frames.shape}")
+        frames = frames.reshape(-1, 33, 3)
+
+    if len(frames) > MAX_INGEST_FRAMES:
+        raise ValueError(f"At most {MAX_INGEST_FRAMES} frames per request")
+    if not np.isfinite(frames).all():
+        raise ValueError("keypoints must be finite")
+    # Way off-frame is fine (the outline gets clipped), but not so far the pixel math overflows
+    if (np.abs(frames[:, :, :2]) > MAX_KEYPOINT_COORD).any():
+        raise ValueError(f"keypoint y/x must be within +-{MAX_KEYPOINT_COORD} (normalized to the frame)")
+    if ((frames[:, :, 2] < 0) | (frames[:, :, 2] > 1)).any():
+        raise ValueError("keypoint visibility must be between 0 and 1")
+    return frames
+
+
+def score_remote_frames(session, frames):
+    """Score a batch of keypoint frames for one player. Returns one result dict per frame."""
+    results = []
+    with session.lock:
+        for frame in frames:
+            keypoints = frame.reshape(1, 1, 33, 3)
+            score_data = score_occupancy(shape_occupancy(body_shapes(keypoints)), session.game.pose_array)
+            session.game.advance(score_data)
+            session.score = score_data
+            results.append({**score_data, "isShrimp": detect_shrimp(keypoints), "pose_id": session.game.pose_id,
+                            "frame": session.game.frame_counter})
+    return results
+
+
+@routes.route('/sessions', methods=['POST'])
+def new_session():
+    """
+    Endpoint to start a remote player session.
+    Returns the session id plus the target pose to show the player.
+    """
+    response = jsonify(sessions.create().state())
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    return response, 201
+
+@routes.route('/sessions/<session_id>', methods=['GET'])
+def session_state(session_id):
+    session = sessions.get(session_id)
+    if session is None:
+        return jsonify({"error": f"Unknown session '{session_id}'"}), 404
+    response = jsonify(session.state())
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    return response
+
+@routes.route('/sessions/<session_id>/keypoints', methods=['POST'])
+def ingest_keypoints(session_id):
+    """
+    Endpoint for remote clients to send keypoints instead of video.
+    Accepts one frame or a batch (JSON or packed float32), returns the score and shrimp state per frame.
+    """
+    session = sessions.get(session_id)
+    if session is None:
+        return jsonify({"error": f"Unknown session '{session_id}'"}), 404
+    try:
+        frames = parse_keypoint_frames(request)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    results = score_remote_frames(session, frames)
+    response = jsonify({"session": session.id, "pose_id": session.game.pose_id, "results": results})
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    return response
+
+@routes.route('/sessions', methods=['OPTIONS'])
+@routes.route('/sessions/<session_id>', methods=['OPTIONS'])
+@routes.route('/sessions/<session_id>/keypoints', methods=['OPTIONS'])
+def options_sessions(session_id=None):
+    response = jsonify({'status': 'success'})
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    response.headers.add("Access-Control-Allow-Headers", "*")
+    response.headers.add("Access-Control-Allow-Methods", "*")
+    return response
+
+
+def number_arg(name, kind=float, default=None):
+    """
+    A numeric query parameter, default if it's not given. Raises ValueError if it's there
+    but isn't a number (request.args.get(type=...) would quietly hand back the default).
+    """
+    raw = request.args.get(name)
+    if raw is None:
+        return default
+    try:
+        return kind(raw)
+    except ValueError:
+        raise ValueError(f"{name} must be {'a whole number' if kind is int else 'a number'}") from None
+
+
+def stream_options(pipeline):
+    """
+    Read the fps/quality/scale query parameters of a video request.
+    Raises ValueError on bad values.
+    """
+    fps = number_arg('fps')
+    quality = number_arg('quality', int)
+    scale = number_arg('scale', default=1.0)
+    if fps is not None and not 1 <= fps <= pipeline.target_fps:
+        raise ValueError(f"fps must be between 1 and {pipeline.target_fps}")
+    if quality is not None and not 10 <= quality <= 100:
+        raise ValueError("quality must be between 10 and 100")
+    if not 0.1 <= scale <= 1.0:
+        raise ValueError("scale must be between 0.1 and 1.0")
+    return fps, quality, scale
+
+@routes.route('/video_feed')
 def video_feed():
-    response = Response(generate_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    """
+    MJPEG stream of the game. Optional ?fps=, ?quality= (JPEG 10-100) and ?scale= (0.1-1.0)
+    trade picture quality for bandwidth; clients asking for the same settings share one encode.
+    """
+    try:
+        pipeline = get_pipeline()
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 500
+    try:
+        fps, quality, scale = stream_options(pipeline)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    response = Response(generate_frames(pipeline, request.remote_addr, fps, quality, scale),
+                        mimetype='multipart/x-mixed-replace; boundary=frame')
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    return response
+
+@routes.route('/video_feed.mp4')
+def video_feed_h264():
+    """
+    H.264 stream of the game as fragmented MP4, playable in a <video> tag. Needs ffmpeg on the PATH.
+    Takes the same ?fps= and ?scale= parameters as /video_feed.
+    """
+    if shutil.which("ffmpeg") is None:
+        return jsonify({"error": "H.264 streaming needs ffmpeg installed, use /video_feed instead"}), 501
+    try:
+        pipeline = get_pipeline()
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 500
+    try:
+        fps, _, scale = stream_options(pipeline)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        stream = get_h264_stream(pipeline, int(fps or pipeline.target_fps), scale)
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 503
+    response = Response(stream.subscribe(), mimetype='video/mp4')
+    response.headers.add("Cache-Control", "no-cache")
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    return response
+
+@routes.route('/video_feed/<station>')
+def station_video_feed(station):
+    """
+    MJPEG stream of one station from the worker pool (see POSE_STATIONS). Optional ?fps=.
+    """
+    stations = get_stations()
+    buffer = stations.buffer(station) if stations else None
+    if buffer is None:
+        return jsonify({"error": f"Unknown station {station}"}), 404
+    try:
+        fps = number_arg('fps')
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if fps is not None and not 1 <= fps <= stations.target_fps:
+        return jsonify({"error": f"fps must be between 1 and {stations.target_fps}"}), 400
+
+    response = Response(generate_station_frames(buffer, fps), mimetype='multipart/x-mixed-replace; boundary=frame')
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    return response
+
+@routes.route('/stations')
+def stations_endpoint():
+    """
+    Endpoint listing the configured stations and their worker processes.
+    """
+    stations = get_stations()
+    response = jsonify(stations.status() if stations else {"profile": None, "stations": {}})
     response.headers.add("Access-Control-Allow-Origin", "*")
     return response
 
-@app.route('/get_score')
+@routes.route('/stations/<station>/score')
+def station_score(station):
+    """
+    Endpoint for a station's latest score and posture state, as published with its last frame.
+    """
+    stations = get_stations()
+    buffer = stations.buffer(station) if stations else None
+    if buffer is None:
+        return jsonify({"error": f"Unknown station {station}"}), 404
+    seq, _, meta = buffer.read()
+    if meta is None:
+        return jsonify({"error": f"Station {station} hasn't published a frame yet"}), 503
+
+    response = jsonify({**meta["score"], **meta["posture"], "pose_id": meta["pose_id"], "frame": seq})
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    response.headers.add("Access-Control-Allow-Headers", "*")
+    response.headers.add("Access-Control-Allow-Methods", "*")
+    return response
+
+@routes.route('/get_score')
 def score_endpoint():
     """
     Endpoint to get the current score based on the latest processed frame.
     Returns the score as JSON.
     """
-    ret, frame = cap.read()
-    if not ret:
+    state = latest_frame_state()
+    if state is None:
         return jsonify({"error": "Could not capture frame"}), 500
-    
-    frame = cv2.resize(frame, (WIDTH, HEIGHT))
-    
-    img_tensor = tf.convert_to_tensor(frame)
-    input_image = tf.image.resize_with_pad(img_tensor, input_size, input_size)
-    input_image = tf.expand_dims(input_image, axis=0)
-    
-    keypoints = movenet(input_image)
-    
-    # Create the poly layer with player's position
-    poly_layer = np.zeros_like(frame)
-    poly_layer = poly(poly_layer, keypoints)
-    
-    # Calculate score using the poly_layer
-    score_data = get_score(poly_layer)
-    
-    response = jsonify(score_data)
+
+    # The pipeline already scored this frame, so polling costs no extra inference
+    response = jsonify({**state["score"], "time_in_pose": state["posture"]["time_in_pose"],
+                        "best_time_in_pose": state["posture"]["best_time_in_pose"], "frame": state["seq"]})
     response.headers.add("Access-Control-Allow-Origin", "*")
     response.headers.add("Access-Control-Allow-Headers", "*")
     response.headers.add("Access-Control-Allow-Methods", "*")
@@ -505,7 +3298,7 @@ def score_endpoint():
     return response
 
 # Add preflight response for CORS
-@app.route('/get_score', methods=['OPTIONS'])
+@routes.route('/get_score', methods=['OPTIONS'])
 def options_get_score():
     response = jsonify({'status': 'success'})
     response.headers.add("Access-Control-Allow-Origin", "*")
@@ -514,7 +3307,7 @@ def options_get_score():
     return response
 
 # Add preflight response for CORS
-@app.route('/video_feed', methods=['OPTIONS'])
+@routes.route('/video_feed', methods=['OPTIONS'])
 def options_video_feed():
     response = jsonify({'status': 'success'})
     response.headers.add("Access-Control-Allow-Origin", "*")
@@ -522,25 +3315,235 @@ def options_video_feed():
     response.headers.add("Access-Control-Allow-Methods", "*")
     return response
 
+@routes.route('/pipeline_stats')
+def pipeline_stats():
+    """
+    Endpoint exposing per-stage latency counters and drop counts for the frame pipeline.
+    """
+    try:
+        response = jsonify(get_pipeline().snapshot())
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 500
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    return response
+
+@routes.route('/posture')
+def posture():
+    """
+    Endpoint for the tracked posture state: person present, settled shrimp flag and
+    durations, and how long the current pose has been held.
+    """
+    state = latest_frame_state()
+    if state is None:
+        return jsonify({"error": "Could not capture frame"}), 500
+
+    response = jsonify({**state["posture"], "frame": state["seq"]})
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    return response
+
+@routes.route('/events')
+def events():
+    """
+    Server-Sent Events endpoint pushing score, pose and shrimp changes as frames are processed,
+    so clients don't have to poll /get_score and /check_shrimp.
+    """
+    try:
+        pipeline = get_pipeline()
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 500
+
+    last_id = request.headers.get('Last-Event-ID')
+    last_id = int(last_id) if last_id and last_id.isdigit() else None
+    response = Response(generate_events(pipeline, last_id), mimetype='text/event-stream')
+    response.headers.add("Cache-Control", "no-cache")
+    response.headers.add("X-Accel-Buffering", "no")
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    return response
+
+@routes.route('/metrics')
+def metrics():
+    """
+    Endpoint for Prometheus to scrape: stage latency histograms, JPEG sizes, drops,
+    missed detections and per-client frame rates.
+    """
+    try:
+        pipeline = get_pipeline()
+    except RuntimeError as e:
+        return Response(f"# pipeline unavailable: {e}\n", status=500, mimetype="text/plain")
+    return Response(prometheus_metrics(pipeline), mimetype="text/plain; version=0.0.4")
+
+@routes.route('/trace', methods=['GET', 'POST'])
+def trace():
+    """
+    Endpoint for the per-frame trace spans, as Chrome trace-event JSON.
+    POST ?enabled=1 (or 0) turns span collection on or off.
+    """
+    try:
+        pipeline = get_pipeline()
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 500
+
+    if request.method == 'POST':
+        pipeline.tracer.enabled = request.args.get('enabled', '1') not in ('0', 'false', 'off')
+        if not pipeline.tracer.enabled:
+            pipeline.tracer.spans.clear()
+        response = jsonify({"enabled": pipeline.tracer.enabled})
+    else:
+        response = jsonify(pipeline.tracer.export())
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    return response
+
+@routes.route('/recording', methods=['GET', 'POST'])
+def recording():
+    """
+    Endpoint for keypoint recording (see KeypointRecorder). POST ?enabled=1 starts a new
+    recording in RECORDINGS_DIR, ?enabled=0 stops it. Both return the recording's status.
+    """
+    try:
+        pipeline = get_pipeline()
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 500
+
+    recorder = pipeline.recorder
+    if request.method == 'POST':
+        if request.args.get('enabled', '1') in ('0', 'false', 'off'):
+            recorder = stop_recording(pipeline)
+        elif recorder is None:
+            recorder = start_recording(pipeline)
+    response = jsonify({"recording": pipeline.recorder is not None, **(recorder.snapshot() if recorder else {})})
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    return response
+
+@routes.route('/profile', methods=['GET', 'POST'])
+def profile_endpoint():
+    """
+    Endpoint to read or switch the quality profile.
+    GET returns the current profile, POST with ?name=<profile> (or a JSON {"name": ...} body) switches it.
+    """
+    try:
+        pipeline = get_pipeline()
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 500
+
+    if request.method == 'POST':
+        body = request.get_json(silent=True) or {}
+        name = request.args.get('name') or body.get('name')
+        try:
+            pipeline.set_profile(name)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    response = jsonify({
+        "profile": pipeline.profile,
+        "settings": QUALITY_PROFILES[pipeline.profile],
+        "available": sorted(QUALITY_PROFILES)
+    })
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    response.headers.add("Access-Control-Allow-Headers", "*")
+    response.headers.add("Access-Control-Allow-Methods", "*")
+    return response
+
+@routes.route('/profile', methods=['OPTIONS'])
+def options_profile():
+    response = jsonify({'status': 'success'})
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    response.headers.add("Access-Control-Allow-Headers", "*")
+    response.headers.add("Access-Control-Allow-Methods", "*")
+    return response
+
+@routes.route('/poses/check', methods=['POST'])
+def check_pose():
+    """
+    Check a drawnPose before it's submitted. Takes JSON {"drawnPose": [[0, 1, ...], ...]}
+    and returns the closest library poses, whether one is a near-duplicate, and whether
+    a body can fill it: the best score PoseValidator found and the keypoints that got it.
+    "feasibility" is the verdict to save with the pose so the library doesn't redo the search.
+    """
+    body = request.get_json(silent=True) or {}
+    try:
+        drawn_pose = np.asarray(body.get('drawnPose'), dtype=np.int8)
+    except (TypeError, ValueError):
+        drawn_pose = None
+    if drawn_pose is None or drawn_pose.ndim != 2 or drawn_pose.size == 0:
+        return jsonify({"error": "drawnPose must be a rectangular 0/1 grid"}), 400
+
+    pose_library.refresh()
+    similar = pose_library.similar(drawn_pose, k=5)
+    duplicate = pose_library.find_duplicate(drawn_pose)
+    feasibility = pose_validator.validate(drawn_pose)
+    keypoints = feasibility.pop("keypoints")
+    verdict = pose_library.verdict(drawn_pose, feasibility)
+    response = jsonify({"duplicate": duplicate is not None, "duplicate_of": duplicate and duplicate["id"],
+                        "similar": similar, "feasible": feasibility.pop("feasible"), "best": feasibility,
+                        "feasibility": verdict,
+                        "best_keypoints": None if keypoints is None else keypoints[0, 0].round(4).tolist()})
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    response.headers.add("Access-Control-Allow-Headers", "*")
+    response.headers.add("Access-Control-Allow-Methods", "*")
+    return response
+
+@routes.route('/poses/<pose_id>/similar')
+def similar_poses(pose_id):
+    """
+    Endpoint for the k library poses closest to a pose, ?k=5&metric=jaccard|hamming.
+    """
+    pose_library.refresh()
+    grid = pose_library.get(pose_id)
+    if grid is None:
+        return jsonify({"error": f"Unknown pose {pose_id}"}), 404
+    metric = request.args.get('metric', 'jaccard')
+    if metric not in ('jaccard', 'hamming'):
+        return jsonify({"error": "metric must be jaccard or hamming"}), 400
+
+    similar = pose_library.similar(grid, k=request.args.get('k', 5, type=int), metric=metric, exclude=pose_id)
+    response = jsonify({"pose_id": pose_id, "metric": metric, "similar": similar})
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    return response
+
+@routes.route('/poses/check', methods=['OPTIONS'])
+def options_check_pose():
+    response = jsonify({'status': 'success'})
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    response.headers.add("Access-Control-Allow-Headers", "*")
+    response.headers.add("Access-Control-Allow-Methods", "*")
+    return response
+
 # Add this new route to your Flask app (paste this into your existing Flask app near the other routes)
 
-@app.route('/check_shrimp')
+@routes.route('/check_shrimp')
 def check_shrimp():
     """
     Endpoint to check if the head is overlapping with the shoulders.
     Returns a JSON response indicating whether a "shrimp" pose is detected.
     """
-    ret, frame = cap.read()
-    if not ret:
+    state = latest_frame_state()
+    if state is None:
         return jsonify({"error": "Could not capture frame"}), 500
-    
-    frame = cv2.resize(frame, (WIDTH, HEIGHT))
-    
-    img_tensor = tf.convert_to_tensor(frame)
-    input_image = tf.image.resize_with_pad(img_tensor, input_size, input_size)
-    input_image = tf.expand_dims(input_image, axis=0)
-    
-    keypoints = movenet(input_image)
+
+    # Settled over the last half second or so, not just this one frame
+    posture = state["posture"]
+    if posture["isShrimp"]:
+        print("SHRIMP DETECTED! Head is below shoulders.")
+
+    response = jsonify({"isShrimp": posture["isShrimp"], "shrimpSeconds": posture["shrimp_seconds"],
+                        "frame": state["seq"]})
+    response.headers.add("Access-Control-Allow-Origin", "*")
+    response.headers.add("Access-Control-Allow-Headers", "*")
+    response.headers.add("Access-Control-Allow-Methods", "*")
+
+    return response
+
+
+def detect_shrimp(keypoints, confidence_threshold=0.3):
+    """
+    Check if the head is overlapping with the shoulders.
+
+    Args:
+        keypoints: Keypoints in the (1, 1, 33, 3) [y, x, visibility] layout returned by movenet()
+
+    Returns:
+        bool: True if a "shrimp" pose is detected
+    """
     keypoints_array = keypoints[0, 0, :, :]
     
     # Extract coordinates for head (nose) and shoulders
@@ -548,7 +3551,6 @@ def check_shrimp():
     l_shoulder_y, l_shoulder_x, l_shoulder_conf = keypoints_array[11]  # Left shoulder
     r_shoulder_y, r_shoulder_x, r_shoulder_conf = keypoints_array[12]  # Right shoulder
     
-    confidence_threshold = 0.3
     is_shrimp = False
     
     # Check if keypoints are detected with sufficient confidence
@@ -571,16 +3573,10 @@ def check_shrimp():
         # This would mean the head is overlapping with the shoulders - a "shrimp" pose
         if nose_y_px >= mid_shoulder_y_px:
             is_shrimp = True
-            print("SHRIMP DETECTED! Head is below shoulders.")
-    
-    response = jsonify({"isShrimp": is_shrimp})
-    response.headers.add("Access-Control-Allow-Origin", "*")
-    response.headers.add("Access-Control-Allow-Headers", "*")
-    response.headers.add("Access-Control-Allow-Methods", "*")
-    
-    return response
 
-@app.route('/check_shrimp', methods=['OPTIONS'])
+    return is_shrimp
+
+@routes.route('/check_shrimp', methods=['OPTIONS'])
 def options_check_shrimp():
     response = jsonify({'status': 'success'})
     response.headers.add("Access-Control-Allow-Origin", "*")
@@ -589,11 +3585,59 @@ def options_check_shrimp():
     return response
 
 
+def create_app(warm=None):
+    """
+    Build the Flask app. Cheap: the camera, pose model and pose database are loaded on
+    first use, or straight away in the background with warm=True. warm=None leaves it
+    to POSE_WARM_UP=1, for WSGI servers that call the factory.
+    """
+    app = Flask(__name__)
+    # Configure CORS to allow specific origins (your React app)
+    CORS(app, resources={r"/*": {"origins": ["http://localhost:3000", "http://localhost:3004", "*"]}}, supports_credentials=True)
+    app.register_blueprint(routes)
+    if warm is None:
+        warm = os.environ.get("POSE_WARM_UP") == "1"
+    if warm:
+        warm_up()
+    return app
+
+
+# Importing this module never warms up (station and batch workers, benchmarks and the
+# reloader parent all import it), only create_app() called by a server or __main__ does
+app = create_app(warm=False)
+
+
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Pose game server")
+    parser.add_argument("--profile", choices=sorted(QUALITY_PROFILES), default=DEFAULT_PROFILE,
+                        help="output resolution / model quality profile (default: %(default)s)")
+    parser.add_argument("--station", action="append", default=[], metavar="NAME=SOURCE",
+                        help="extra play station served at /video_feed/NAME by its own worker process; "
+                             "SOURCE is a camera index, video file or stream URL (repeatable)")
+    parser.add_argument("--check-poses", nargs="?", const="db.json", metavar="DB",
+                        help="check which poses in DB (default: db.json) a body can fill, save the results "
+                             "into it and exit")
+    args = parser.parse_args()
+    if args.check_poses:
+        print(f"Checked {check_pose_database(args.check_poses)} poses")
+        sys.exit(0)
+    DEFAULT_PROFILE = args.profile
+    try:
+        STATIONS.update(parse_stations(args.station))
+    except ValueError as e:
+        parser.error(str(e))
+    # The debug reloader runs this file twice; only the child that serves requests should grab the camera
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        warm_up()
+
     try:
         app.run(host='localhost', port=3003, debug=True, threaded=True)
     except KeyboardInterrupt:
         print("\nExiting via Ctrl+C...")
     finally:
-        cap.release()
+        if _pipeline is not None:
+            _pipeline.stop()
+        if _stations is not None:
+            _stations.stop()
         sys.exit(0)
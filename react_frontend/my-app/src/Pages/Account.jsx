@@ -16,7 +16,7 @@ const Account = () => {
     const [shrimpDetection, setShrimpDetection] = useState(false);
     const [isShrimp, setIsShrimp] = useState(false);
     const [videoFeed, setVideoFeed] = useState(null);
-    const shrimpCheckIntervalRef = useRef(null);
+    const shrimpEventsRef = useRef(null);
     const { isAuthenticated } = useAuth0();
     
     // Fetch user profile from backend when component mounts
@@ -45,45 +45,40 @@ const Account = () => {
             // Start fetching video feed
             setVideoFeed('http://localhost:3003/video_feed');
             
-            // Start polling the score endpoint to check for head-shoulder overlap
-            shrimpCheckIntervalRef.current = setInterval(async () => {
-                try {
-                    const response = await fetch('http://localhost:3003/get_score');
-                    const data = await response.json();
-                    
-                    // Check if we have a score - this means pose detection is running
-                    if (data.score !== undefined) {
-                        // Make another request to check if head overlaps with shoulders
-                        // We'll need to modify the Flask backend to add this endpoint
-                        const shrimpResponse = await fetch('http://localhost:3003/check_shrimp');
-                        const shrimpData = await shrimpResponse.json();
-                        
-                        setIsShrimp(shrimpData.isShrimp);
-                        
-                        if (shrimpData.isShrimp) {
-                            // Maybe play a sound or show an alert
-                            console.log("SHRIMP DETECTED!");
-                        }
-                    }
-                } catch (error) {
-                    console.error('Error checking for shrimp:', error);
+            // Listen for shrimp transitions; the server pushes them as soon as the posture changes
+            shrimpEventsRef.current = new EventSource('http://localhost:3003/events');
+            // The first message has the current posture, in case we connect mid-shrimp
+            shrimpEventsRef.current.addEventListener('hello', (event) => {
+                setIsShrimp(JSON.parse(event.data).isShrimp);
+            });
+            shrimpEventsRef.current.addEventListener('shrimp', (event) => {
+                const shrimpData = JSON.parse(event.data);
+                setIsShrimp(shrimpData.isShrimp);
+
+                if (shrimpData.isShrimp) {
+                    // Maybe play a sound or show an alert
+                    console.log("SHRIMP DETECTED!");
                 }
-            }, 1000); // Check every second
+            });
+            shrimpEventsRef.current.onerror = (error) => {
+                // EventSource reconnects on its own and resumes from the last event it saw
+                console.error('Error checking for shrimp:', error);
+            };
             
         } else {
-            // Stop the video feed and interval
+            // Stop the video feed and event stream
             setVideoFeed(null);
-            if (shrimpCheckIntervalRef.current) {
-                clearInterval(shrimpCheckIntervalRef.current);
-                shrimpCheckIntervalRef.current = null;
+            if (shrimpEventsRef.current) {
+                shrimpEventsRef.current.close();
+                shrimpEventsRef.current = null;
             }
             setIsShrimp(false);
         }
         
-        // Cleanup function to clear interval when component unmounts
+        // Cleanup function to close the event stream when component unmounts
         return () => {
-            if (shrimpCheckIntervalRef.current) {
-                clearInterval(shrimpCheckIntervalRef.current);
+            if (shrimpEventsRef.current) {
+                shrimpEventsRef.current.close();
             }
         };
     }, [shrimpDetection]);
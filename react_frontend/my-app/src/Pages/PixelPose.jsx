@@ -183,6 +183,34 @@ const PixelPose = () => {
 
     // Post the drawing (placeholder)
     const handlePost = async () => {
+        // Turn away poses that are (nearly) the same as one already in the library,
+        // or that no body could fill. If the pose server is down, just save it.
+        // The feasibility verdict is saved with the pose so the game doesn't have to redo the search.
+        let feasibility;
+        try {
+            const check = await fetch("http://localhost:3003/poses/check", {
+                method: "POST",
+                headers: {
+                    "Content-Type": "application/json",
+                },
+                body: JSON.stringify({ drawnPose: drawnPose }),
+            });
+            if (check.ok) {
+                const result = await check.json();
+                if (result.duplicate) {
+                    alert("This pose is almost the same as one that already exists. Try something different!");
+                    return;
+                }
+                if (result.feasible === false) {
+                    alert(`This pose can't be filled by a body, the best we could find only scores ${result.best.score} / ${result.best.max_possible}. Try a pose you can actually strike!`);
+                    return;
+                }
+                feasibility = result.feasibility;
+            }
+        } catch (error) {
+            console.error("Could not check pose for duplicates:", error);
+        }
+
         try {
             const response = await fetch("http://localhost:8080/poses", {
                 method: "POST",
@@ -191,6 +219,7 @@ const PixelPose = () => {
                 },
                 body: JSON.stringify({ 
                     drawnPose: drawnPose,
+                    feasibility: feasibility,
                     createdAt: new Date().toISOString() 
                 }),
             });
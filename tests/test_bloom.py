@@ -0,0 +1,57 @@
+"""The downsampled bloom of the lower quality profiles has to stay close to the full-resolution blur."""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import flask_app  # noqa: E402
+
+FIXTURES = np.load(os.path.join(ROOT, "benchmarks", "fixtures", "keypoints.npy")).astype(np.float64)
+MIN_PSNR = 40.0  # dB, over the pixels either version lit; same limits as bench_frame.check_bloom
+MAX_ERROR = 48  # worst single channel
+DOWNSAMPLED = sorted(name for name, settings in flask_app.QUALITY_PROFILES.items()
+                     if settings["bloom_downsample"] > 1)
+
+
+@pytest.mark.parametrize("index", range(len(FIXTURES)))
+@pytest.mark.parametrize("profile", DOWNSAMPLED)
+def test_downsampled_bloom_matches_full_blur(profile, index):
+    settings = flask_app.QUALITY_PROFILES[profile]
+    width, height, downsample = settings["width"], settings["height"], settings["bloom_downsample"]
+    shapes = flask_app.body_shapes(FIXTURES[index], width=width, height=height)
+    if not shapes:
+        pytest.skip("nobody in this fixture")
+    blur_size = flask_app.FrameCompositor((height, width, 3)).blur_size
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    glow_layer = np.zeros_like(image)
+    flask_app.draw_body(image, glow_layer, shapes)
+    exact = flask_app.add_glow(image.copy(), glow_layer, blur_size).astype(np.int32)
+    fast = flask_app.add_glow(image.copy(), glow_layer, blur_size, downsample).astype(np.int32)
+
+    error = np.abs(exact - fast)[(exact > 0) | (fast > 0)]
+    assert error.size
+    mse = float((error.astype(np.float64) ** 2).mean())
+    psnr = 10 * np.log10(255 ** 2 / mse) if mse else float("inf")
+    assert psnr >= MIN_PSNR, f"{profile}: bloom PSNR {psnr:.1f} dB"
+    assert error.max() <= MAX_ERROR, f"{profile}: bloom off by {error.max()}"
+
+
+@pytest.mark.parametrize("downsample", [1, 2, 4])
+def test_glow_reuses_scratch_buffers(downsample):
+    shapes = next(shapes for shapes in (flask_app.body_shapes(keypoints, width=640, height=360)
+                                        for keypoints in FIXTURES) if shapes)
+    image = np.zeros((360, 640, 3), dtype=np.uint8)
+    glow_layer = np.zeros_like(image)
+    flask_app.draw_body(image, glow_layer, shapes)
+    expected = flask_app.add_glow(image.copy(), glow_layer, 17, downsample)
+
+    small = np.zeros((360 // downsample, 640 // downsample, 3), dtype=np.uint8)
+    blurred = np.zeros_like(image)
+    out = flask_app.add_glow(image.copy(), glow_layer, 17, downsample, small=small, blurred=blurred)
+    np.testing.assert_array_equal(out, expected)
+    assert blurred.any()  # the blur went into the buffer given, not a fresh array
+    if downsample > 1:
+        assert small.any()
@@ -0,0 +1,48 @@
+"""DotParticles.draw has to look exactly like the original one-cv2.circle-per-dot layer."""
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import flask_app  # noqa: E402
+
+
+def baseline(image, dots, mirror, scale):
+    """The original renderer: every dot cv2.circle-d onto one zero layer, which is then added once."""
+    layer = np.zeros_like(image)
+    for x, y, radius, gray in zip(dots.x, dots.y, dots.radius, dots.gray):
+        center = (int(x * scale), int(y * scale))
+        cv2.circle(layer, center, max(int(round(radius * scale)), 1), (int(gray),) * 3, -1)
+    cv2.add(image, layer[:, ::-1] if mirror else layer, dst=image)
+
+
+@pytest.mark.parametrize("mirror", [False, True])
+@pytest.mark.parametrize("scale", [1.0, 0.5])
+def test_draw_matches_baseline(mirror, scale):
+    dots = flask_app.DotParticles(2000, seed=7)
+    rng = np.random.default_rng(7)
+    shape = (int(flask_app.HEIGHT * scale), int(flask_app.WIDTH * scale), 3)
+    for _ in range(3):
+        dots.update()
+        expected = rng.integers(0, 256, shape, dtype=np.uint8)
+        image = expected.copy()
+        baseline(expected, dots, mirror, scale)
+        mask = dots.draw(image, mirror, scale)
+        np.testing.assert_array_equal(image, expected)
+        assert mask.shape == shape[:2]
+
+
+def test_overlapping_dots_overwrite():
+    dots = flask_app.DotParticles(2, seed=0)
+    dots.x[:] = [100, 103]
+    dots.y[:] = [100, 100]
+    dots.radius[:] = 4
+    dots.gray[:] = [100, 70]
+    image = np.zeros((flask_app.HEIGHT, flask_app.WIDTH, 3), dtype=np.uint8)
+    dots.draw(image)
+    assert image[100, 102, 0] == 70  # the later dot, not 170
+    assert image.max() == 100
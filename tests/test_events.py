@@ -0,0 +1,50 @@
+"""/events streams: a Last-Event-ID that can't be caught up from is treated like a new client."""
+import os
+import sys
+import threading
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import flask_app  # noqa: E402
+
+POSTURE = {"isShrimp": True, "shrimp_total_seconds": 1.0}
+
+
+def fake_pipeline(frames):
+    """Just the parts of FramePipeline generate_events() reads, after `frames` rendered frames."""
+    pipeline = types.SimpleNamespace(_output=threading.Condition(), events=flask_app.GameEvents(),
+                                     _posture=POSTURE, _seq=frames, game=types.SimpleNamespace(pose_id="a"))
+    pipeline.wait_for_events = types.MethodType(flask_app.FramePipeline.wait_for_events, pipeline)
+    for frame in range(1, frames + 1):
+        pipeline._score = {"score": frame, "boxes_lit": frame, "incorrect_boxes": 0, "total_boxes": 10,
+                           "max_possible": 100}
+        pipeline.events.update(frame, pipeline._score, {**POSTURE, "isShrimp": frame % 2 == 0}, "a")
+    return pipeline
+
+
+def first_chunk(pipeline, last_id):
+    return next(flask_app.generate_events(pipeline, last_id, min_interval=0, keepalive=0.1))
+
+
+def test_new_client_gets_hello():
+    assert first_chunk(fake_pipeline(10), None).startswith("event: hello")
+
+
+def test_reconnect_catches_up_without_hello():
+    pipeline = fake_pipeline(10)
+    chunk = first_chunk(pipeline, pipeline.events.last_id - 3)
+    assert chunk.startswith(f"id: {pipeline.events.last_id - 2}\n")
+    assert "event: hello" not in chunk
+
+
+def test_id_from_before_a_restart_gets_hello():
+    assert first_chunk(fake_pipeline(10), 5000).startswith("event: hello")
+
+
+def test_client_behind_the_buffer_gets_hello():
+    pipeline = fake_pipeline(300)  # well over max_events
+    assert not pipeline.events.covers(1)
+    assert first_chunk(pipeline, 1).startswith("event: hello")
+    oldest = pipeline.events.events[0][0]
+    assert pipeline.events.covers(oldest - 1)
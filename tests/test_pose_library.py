@@ -0,0 +1,76 @@
+"""PoseLibrary: stored feasibility verdicts only count while they match, and reloads stay off the render thread."""
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import flask_app  # noqa: E402
+
+
+def drawn_pose(seed):
+    return np.random.default_rng(seed).integers(0, 2, (18, 32)).tolist()
+
+
+def test_stored_verdicts(tmp_path):
+    library = flask_app.PoseLibrary(str(tmp_path / "db.json"))
+    impossible = {"feasible": False, "ratio": 0.4, "score": 40, "max_possible": 100}
+    poses = [
+        {"id": "checked", "drawnPose": drawn_pose(0),
+         "feasibility": {**impossible, "grid": library.fingerprint(np.array(drawn_pose(0)))}},
+        {"id": "edited", "drawnPose": drawn_pose(1),
+         "feasibility": {**impossible, "grid": library.fingerprint(np.array(drawn_pose(2)))}},
+        {"id": "unchecked", "drawnPose": drawn_pose(3)},
+    ]
+    (tmp_path / "db.json").write_text(json.dumps({"poses": poses}))
+    library.refresh()
+
+    assert not library.feasible("checked")
+    assert library.feasible("edited")
+    assert library.feasible("unchecked")
+    assert "checked" not in {library.random_pose()[0] for _ in range(50)}
+
+
+def test_change_pose_does_not_wait_for_reload(tmp_path, monkeypatch):
+    path = tmp_path / "db.json"
+    path.write_text(json.dumps({"poses": [{"id": "a", "drawnPose": drawn_pose(0)}]}))
+    library = flask_app.PoseLibrary(str(path))
+    monkeypatch.setattr(flask_app, "pose_library", library)
+    game = flask_app.GameState(particles=False)
+    assert game.pose_id == "a"  # the first load happens in place
+
+    path.write_text(json.dumps({"poses": [{"id": "b", "drawnPose": drawn_pose(1)}]}))
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 10 ** 9))
+    load = flask_app.load_pose_database
+
+    def slow_load(filename):
+        time.sleep(1.0)
+        return load(filename)
+
+    monkeypatch.setattr(flask_app, "load_pose_database", slow_load)
+    monkeypatch.setattr(flask_app, "_reload_executor", lambda broken=None: None)  # parse on the thread
+    start = time.perf_counter()
+    game.change_pose()
+    assert time.perf_counter() - start < 0.2
+    assert game.pose_id == "a"
+
+    library._reloader.join()
+    game.change_pose()
+    assert game.pose_id == "b"
+
+
+def test_reload_in_worker_process(tmp_path):
+    path = tmp_path / "db.json"
+    path.write_text(json.dumps({"poses": [{"id": "a", "drawnPose": drawn_pose(0)}]}))
+    library = flask_app.PoseLibrary(str(path))
+    library.refresh()
+
+    poses = [{"id": "b", "drawnPose": drawn_pose(1)}, {"id": "c", "drawnPose": drawn_pose(2)}]
+    path.write_text(json.dumps({"poses": poses}))
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 10 ** 9))
+    assert library.refresh(in_worker=True)
+    assert library.ids() == ["b", "c"]
+    np.testing.assert_array_equal(library.get("c"), flask_app.target_grid(np.array(drawn_pose(2)), 9, 16))
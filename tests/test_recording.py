@@ -0,0 +1,48 @@
+"""Keypoint recordings keep full pose ids, refuse ids that don't fit, and still read version 1 files."""
+import os
+import sys
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import flask_app  # noqa: E402
+
+SCORE = {"score": 5, "max_possible": 9, "boxes_lit": 6, "total_boxes": 9, "incorrect_boxes": 1}
+KEYPOINTS = np.linspace(0, 1, 99).reshape(1, 1, 33, 3)
+
+
+def record(path, pose_ids):
+    recorder = flask_app.KeypointRecorder(str(path), chunk_frames=2)
+    for frame, pose_id in enumerate(pose_ids):
+        recorder.append(1000.0 + frame, frame, KEYPOINTS, SCORE, pose_id, False)
+    recorder.close()
+    return flask_app.KeypointRecording(str(path))
+
+
+def test_object_id_round_trips(tmp_path):
+    object_id = "65f1c0ffee0123456789abcd"
+    recording = record(tmp_path / "a.pxkp", ["6ab0", object_id, None])
+    assert [value.decode() for value in recording.records["pose_id"]] == ["6ab0", object_id, ""]
+    assert recording.score(1) == SCORE
+    np.testing.assert_allclose(recording.keypoints(2), KEYPOINTS, atol=1e-6)
+
+
+def test_too_long_id_is_not_truncated(tmp_path, capsys):
+    recording = record(tmp_path / "b.pxkp", ["x" * 25, "6ab0", "x" * 25])
+    assert [value.decode() for value in recording.records["pose_id"]] == ["", "6ab0", ""]
+    assert capsys.readouterr().out.count("without its id") == 1
+
+
+def test_reads_version_1(tmp_path):
+    dtype = flask_app.recording_dtype(32, version=1)
+    records = np.zeros(2, dtype=dtype)
+    records["pose_id"] = [b"6ab0", b"12345678"]
+    records["score"] = [3, 4]
+    path = tmp_path / "old.pxkp"
+    path.write_bytes(flask_app.RECORDING_HEADER.pack(flask_app.RECORDING_MAGIC, 1, 32, dtype.itemsize)
+                     + records.tobytes())
+    recording = flask_app.KeypointRecording(str(path))
+    assert recording.version == 1
+    assert list(recording.records["pose_id"]) == [b"6ab0", b"12345678"]
+    assert int(recording.records["score"][1]) == 4
@@ -0,0 +1,53 @@
+"""Geometry scoring (shape_occupancy) has to light the same cells as scoring the rendered poly() layer."""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import flask_app  # noqa: E402
+
+FIXTURES = np.load(os.path.join(ROOT, "benchmarks", "fixtures", "keypoints.npy")).astype(np.float64)
+
+
+def random_keypoints(seed):
+    """Landmarks scattered over and past the frame edges, so shapes get clipped every which way."""
+    rng = np.random.default_rng(seed)
+    keypoints = np.zeros((1, 1, 33, 3))
+    keypoints[0, 0, :, :2] = rng.uniform(-0.3, 1.3, (33, 2))
+    keypoints[0, 0, :, 2] = rng.uniform(0, 1, 33)
+    return keypoints
+
+
+def pixel_occupancy(keypoints, shapes):
+    frame = np.zeros((flask_app.HEIGHT, flask_app.WIDTH, 3), dtype=np.uint8)
+    return flask_app.cell_occupancy(flask_app.poly(frame, keypoints, shapes=shapes))
+
+
+@pytest.mark.parametrize("index", range(len(FIXTURES)))
+def test_geometry_matches_pixel_on_fixtures(index):
+    keypoints = FIXTURES[index]
+    shapes = flask_app.body_shapes(keypoints)
+    np.testing.assert_array_equal(flask_app.shape_occupancy(shapes), pixel_occupancy(keypoints, shapes))
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_geometry_matches_pixel_off_frame(seed):
+    keypoints = random_keypoints(seed)
+    shapes = flask_app.body_shapes(keypoints)
+    np.testing.assert_array_equal(flask_app.shape_occupancy(shapes), pixel_occupancy(keypoints, shapes))
+
+
+def test_nobody_lights_nothing():
+    assert not flask_app.shape_occupancy([]).any()
+
+
+@pytest.mark.parametrize("index", range(0, len(FIXTURES), 7))
+def test_score_keypoints_matches_rendered_score(index):
+    keypoints = FIXTURES[index]
+    rows, cols = flask_app.HEIGHT // flask_app.GRID_SIZE, flask_app.WIDTH // flask_app.GRID_SIZE
+    target = np.random.default_rng(index).integers(0, 2, (rows, cols))
+    frame = flask_app.poly(np.zeros((flask_app.HEIGHT, flask_app.WIDTH, 3), dtype=np.uint8), keypoints)
+    assert flask_app.score_keypoints(keypoints, target) == flask_app.get_score(frame, target)
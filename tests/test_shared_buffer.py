@@ -0,0 +1,122 @@
+"""SharedFrameBuffer's two-slot protocol: readers get the latest whole frame or nothing, never a torn one."""
+import os
+import sys
+import threading
+import types
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import flask_app  # noqa: E402
+
+
+@pytest.fixture
+def buffer():
+    buffer = flask_app.SharedFrameBuffer.create(1024)
+    yield buffer
+    buffer.close()
+    buffer.unlink()
+
+
+def frame(seq, size=None):
+    # Every byte says which frame it belongs to, so a mix of two frames shows up
+    return bytes([seq % 251 + 1]) * (size or 100 + seq % 900)
+
+
+def test_write_read(buffer):
+    assert buffer.read() == (0, None, None)
+    for seq in (1, 2, 3):
+        assert buffer.write(seq, frame(seq), {"seq": seq, "score": seq * 10})
+    assert buffer.read() == (3, frame(3), {"seq": 3, "score": 30})
+    assert buffer.read(3) == (3, None, None)
+
+    reader = flask_app.SharedFrameBuffer.attach(buffer.name, buffer.frame_bytes)
+    try:
+        assert reader.read(2) == (3, frame(3), {"seq": 3, "score": 30})
+    finally:
+        reader.close()
+
+
+def test_frame_that_does_not_fit_is_skipped(buffer):
+    assert buffer.write(1, frame(1), {"seq": 1})
+    assert not buffer.write(2, frame(2, size=buffer.frame_bytes + 1), {"seq": 2})
+    assert not buffer.write(3, frame(3), {"blob": "x" * buffer.META_BYTES})
+    # The last frame that fitted is still the latest, untouched
+    assert buffer.read() == (1, frame(1), {"seq": 1})
+    assert buffer.write(4, frame(4, size=buffer.frame_bytes), {"seq": 4})
+    assert buffer.read(1) == (4, frame(4, size=buffer.frame_bytes), {"seq": 4})
+
+
+def test_slot_being_rewritten_is_not_read(buffer):
+    buffer.write(1, frame(1), {"seq": 1})
+    buffer.write(2, frame(2), {"seq": 2})
+    # The writer starts on frame 3, which reuses frame 1's slot: frame 2 is still readable
+    offset = buffer._slot(3)
+    buffer.SLOT.pack_into(buffer.shm.buf, offset, 0, 0, 0)
+    buffer.shm.buf[offset + buffer.SLOT.size:offset + buffer.SLOT.size + 50] = frame(3, size=50)
+    assert buffer.read() == (2, frame(2), {"seq": 2})
+
+    # A header still pointing at a slot whose stamp was cleared gives nothing rather than a mix
+    buffer.HEADER.pack_into(buffer.shm.buf, 0, 1)
+    assert buffer.read() == (0, None, None)
+    assert buffer.read(2) == (2, None, None)
+
+
+class CopyHook(bytearray):
+    """Memory that runs a callback the first time a frame is copied out of it."""
+
+    def __init__(self, size, callback):
+        super().__init__(size)
+        self.callback = callback
+
+    def __getitem__(self, key):
+        part = super().__getitem__(key)
+        if isinstance(key, slice) and self.callback:
+            callback, self.callback = self.callback, None
+            callback()
+        return part
+
+
+def test_slot_rewritten_during_copy_is_retried():
+    size = flask_app.SharedFrameBuffer.HEADER.size + 2 * (flask_app.SharedFrameBuffer.SLOT.size + 1024
+                                                          + flask_app.SharedFrameBuffer.META_BYTES)
+    writer = flask_app.SharedFrameBuffer(types.SimpleNamespace(name="fake", buf=bytearray(size)), 1024)
+    writer.write(1, frame(1), {"seq": 1})
+    writer.write(2, frame(2), {"seq": 2})
+    # The jpeg of frame 1 is copied, then the worker laps the reader twice before the metadata is
+    memory = CopyHook(size, lambda: [writer.write(seq, frame(seq), {"seq": seq}) for seq in (3, 4, 5)])
+    memory[:] = writer.shm.buf
+    writer.shm.buf = memory
+    writer.HEADER.pack_into(memory, 0, 1)  # the reader arrives while frame 1 is latest
+    assert writer.read() == (5, frame(5), {"seq": 5})
+
+
+def test_concurrent_reads_are_never_torn(buffer):
+    stop = threading.Event()
+
+    def writer():
+        seq = 0
+        while not stop.is_set():
+            seq += 1
+            buffer.write(seq, frame(seq), {"seq": seq})
+
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # make the threads interleave mid-write as often as possible
+    thread = threading.Thread(target=writer, daemon=True)
+    thread.start()
+    try:
+        seen, last_seq = 0, 0
+        for _ in range(20000):
+            seq, jpeg, meta = buffer.read(last_seq)
+            if jpeg is None:
+                continue
+            assert seq > last_seq
+            assert meta == {"seq": seq}
+            assert jpeg == frame(seq)
+            seen, last_seq = seen + 1, seq
+    finally:
+        stop.set()
+        thread.join()
+        sys.setswitchinterval(switch_interval)
+    assert seen
@@ -0,0 +1,41 @@
+"""Video request parameters: bad numbers are a 400, and H.264 start-up can't hang on a silent pipeline."""
+import os
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import flask_app  # noqa: E402
+
+PIPELINE = types.SimpleNamespace(target_fps=30)
+
+
+def options(query):
+    with flask_app.app.test_request_context("/video_feed" + query):
+        return flask_app.stream_options(PIPELINE)
+
+
+def test_defaults_and_values():
+    assert options("") == (None, None, 1.0)
+    assert options("?fps=15&quality=70&scale=0.5") == (15.0, 70, 0.5)
+
+
+@pytest.mark.parametrize("query", ["?fps=abc", "?quality=zz", "?quality=7.5", "?scale=big", "?fps=",
+                                   "?fps=nan", "?fps=120", "?quality=5", "?scale=2"])
+def test_bad_values_raise(query):
+    with pytest.raises(ValueError):
+        options(query)
+
+
+def test_h264_gives_up_without_frames():
+    silent = types.SimpleNamespace(_output=threading.Condition(), _seq=0, _frame=None)
+    silent.wait_for_raw = types.MethodType(flask_app.FramePipeline.wait_for_raw, silent)
+    start = time.perf_counter()
+    with pytest.raises(RuntimeError):
+        flask_app.get_h264_stream(silent, 15, 1.0, timeout=0.2)
+    assert time.perf_counter() - start < 1.0
+    assert not flask_app._h264_lock.locked()
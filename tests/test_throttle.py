@@ -0,0 +1,65 @@
+"""InferenceThrottle on a fake clock: camera frames at 30 fps and an inference thread that takes `latency`."""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import flask_app  # noqa: E402
+
+INTERVAL = 1 / 30
+
+
+def simulate(throttle, clock, seconds, latency, render=0.010):
+    """
+    Run `seconds` of frames from clock[0] on. The inference thread takes the newest frame
+    once it's free, the renderer reports `render` seconds per frame.
+
+    Returns:
+        float: share of the time the inference thread was busy
+    """
+    busy, free_at = 0.0, clock[0]
+    end = clock[0] + seconds
+    while clock[0] < end:
+        now = clock[0]
+        if now >= free_at and throttle.should_run(now):
+            throttle.record(latency)
+            free_at = now + latency
+            busy += latency
+        throttle.record_render(now, render)
+        clock[0] += INTERVAL
+    return busy / seconds
+
+
+@pytest.mark.parametrize("latency", [0.020, 0.070, 0.100, 0.250])
+def test_inference_leaves_the_renderer_headroom(latency):
+    throttle, clock = flask_app.InferenceThrottle(INTERVAL), [0.0]
+    simulate(throttle, clock, 5, latency)  # let the smoothing settle
+    assert simulate(throttle, clock, 10, latency) <= throttle.duty + 0.02
+
+
+def test_factor_rises_and_recovers():
+    throttle, clock = flask_app.InferenceThrottle(INTERVAL), [0.0]
+    simulate(throttle, clock, 5, 0.010)
+    assert throttle.factor == 1
+
+    simulate(throttle, clock, 5, 0.100)
+    assert throttle.factor == 6  # 100 ms at half the wall time: every 200 ms
+
+    simulate(throttle, clock, 10, 0.010)
+    assert throttle.factor == 1
+
+
+def test_render_overrun_sheds_more_inference():
+    throttle, clock = flask_app.InferenceThrottle(INTERVAL), [0.0]
+    simulate(throttle, clock, 5, 0.040)
+    relaxed = throttle.factor
+
+    simulate(throttle, clock, 10, 0.040, render=0.045)  # renderer over its 33 ms budget
+    assert throttle.duty == throttle.min_duty
+    assert throttle.factor > relaxed
+
+    simulate(throttle, clock, 20, 0.040, render=0.010)
+    assert throttle.duty == throttle.max_duty
+    assert throttle.factor == relaxed
@@ -0,0 +1,57 @@
+"""PoseValidator: poses a real body made are feasible, ones no body can fill aren't, and a check stays quick."""
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import flask_app  # noqa: E402
+
+FIXTURES = np.load(os.path.join(ROOT, "benchmarks", "fixtures", "keypoints.npy")).astype(np.float64)
+MAX_SECONDS = 1.0  # per validation once the tables are built; about 0.3-0.4s here
+
+
+def body_grid(index):
+    """The cells a fixture body lights, as a drawnPose of 0/1 rows like the editor saves."""
+    grid = flask_app.shape_occupancy(flask_app.body_shapes(FIXTURES[index]))
+    assert grid.any()
+    return grid.astype(int).tolist()
+
+
+@pytest.fixture(scope="module")
+def validator():
+    validator = flask_app.PoseValidator()
+    validator.tables()
+    return validator
+
+
+@pytest.mark.parametrize("index", [5, 17, 26, 31])  # few cells, a full body, a big close-up, the slowest
+def test_body_is_feasible(validator, index):
+    result = validator.validate(body_grid(index))
+    assert result["feasible"], result["ratio"]
+    assert result["keypoints"].shape == (1, 1, 33, 3)
+
+
+def test_all_cells_are_not_feasible(validator):
+    result = validator.validate(np.ones((validator.rows, validator.cols), dtype=int))
+    assert not result["feasible"], result["ratio"]
+
+
+def test_scattered_cells_are_not_feasible(validator):
+    grid = np.zeros((validator.rows, validator.cols), dtype=int)
+    grid[::2, ::3] = 1
+    result = validator.validate(grid)
+    assert not result["feasible"], result["ratio"]
+
+
+def test_validation_is_quick(validator):
+    grid = body_grid(31)
+    times = []
+    for _ in range(2):
+        start = time.perf_counter()
+        validator.validate(grid)
+        times.append(time.perf_counter() - start)
+    assert min(times) < MAX_SECONDS, f"validation took {min(times):.2f}s"
@@ -0,0 +1,35 @@
+"""POSE_WARM_UP only warms the server up through the app factory, never on import."""
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import flask_app  # noqa: E402
+
+
+@pytest.mark.parametrize("module", ["flask_app", "batch_score"])
+def test_import_does_not_warm_up(module):
+    code = ("import flask_app, %s, os; print(flask_app._warmup_thread is None, 'POSE_WARM_UP' in os.environ)"
+            % module)
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True,
+                            env=dict(os.environ, POSE_WARM_UP="1"), timeout=60)
+    assert result.returncode == 0, result.stderr
+    # batch_score also drops the variable so its spawned workers never see it
+    assert result.stdout.split()[-2:] == ["True", "False" if module == "batch_score" else "True"]
+
+
+@pytest.mark.parametrize("warm, env, expected", [
+    (None, "1", True), (None, None, False), (False, "1", False), (True, None, True),
+])
+def test_factory_warm_up(monkeypatch, warm, env, expected):
+    calls = []
+    monkeypatch.setattr(flask_app, "warm_up", lambda: calls.append(1))
+    if env is None:
+        monkeypatch.delenv("POSE_WARM_UP", raising=False)
+    else:
+        monkeypatch.setenv("POSE_WARM_UP", env)
+    flask_app.create_app(warm=warm)
+    assert bool(calls) == expected